@@ -0,0 +1,108 @@
+# Felipe Bona, João Martinho
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import nibabel as nib
+import numpy as np
+from scipy.ndimage import binary_erosion, generate_binary_structure, gaussian_filter
+
+from Trabalho01 import ProcessadorDeImagens
+
+
+def etapas_float64(caminho):
+    # Reprodução das etapas antigas: volume normalizado em float64, cópia para a
+    # imagem atual e máscaras em uint8 rebinarizadas a cada passo
+    original = nib.load(caminho).get_fdata()
+    original = (original - np.min(original)) / (np.max(original) - np.min(original) + 1e-8)
+    atual = original.copy()
+
+    estrutura = generate_binary_structure(3, 2)
+    atual = (atual > 0.5).astype(np.uint8)
+    atual = binary_erosion((atual > 0.5).astype(np.uint8), structure=estrutura)
+    binaria = (atual > 0.5).astype(np.uint8)
+    atual = binaria - binary_erosion(binaria, structure=estrutura)
+    return atual
+
+
+def etapas_compactas(caminho):
+    processador = ProcessadorDeImagens(caminho)
+    processador.carregar_imagem()
+    processador.binarizar()
+    processador.erodir()
+    processador.detectar_contornos()
+    return processador.imagem_atual
+
+
+ETAPAS = {"float64": etapas_float64, "compacto": etapas_compactas}
+
+
+def _status_kib(campo):
+    with open("/proc/self/status") as arquivo:
+        for linha in arquivo:
+            if linha.startswith(campo + ":"):
+                return int(linha.split()[1])
+    raise KeyError(campo)
+
+
+def _medir_no_processo(nome, caminho):
+    # O tracemalloc não vê páginas de um .nii mapeado em memória, então o pico de
+    # RSS também é medido, num processo novo por medição. O pico é zerado depois dos
+    # imports (clear_refs = 5, Linux) e a medida é o quanto ele subiu acima do RSS inicial
+    with open("/proc/self/clear_refs", "w") as arquivo:
+        arquivo.write("5")
+    rss_inicial = _status_kib("VmRSS")
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = ETAPAS[nome](caminho)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = (_status_kib("VmHWM") - rss_inicial) * 1024
+    return np.asarray(resultado).astype(bool), pico, rss, duracao
+
+
+def medir(nome, caminho):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_medir_no_processo, nome, caminho).result()
+
+
+def gerar_volume(caminho, formato, semente=0):
+    rng = np.random.default_rng(semente)
+    volume = (gaussian_filter(rng.random(formato, dtype=np.float32), 4) * 4000).astype(np.int16)
+    nib.save(nib.Nifti1Image(volume, np.eye(4)), caminho)
+
+
+def main():
+    lado = int(sys.argv[1]) if len(sys.argv) > 1 else 192
+    formato = (lado, lado, lado // 2)
+
+    tamanho_arquivo = np.prod(formato) * 2
+    print(f"Volume int16 {formato}: {tamanho_arquivo / 2 ** 20:.1f} MiB de dados")
+
+    # .nii é lido por mapeamento de memória (invisível ao tracemalloc); .nii.gz é
+    # descomprimido para a memória e aparece nas duas medidas
+    with tempfile.TemporaryDirectory() as pasta:
+        for extensao in (".nii", ".nii.gz"):
+            caminho = os.path.join(pasta, f"volume{extensao}")
+            gerar_volume(caminho, formato)
+
+            antigo, traced_antigo, rss_antigo, tempo_antigo = medir("float64", caminho)
+            novo, traced_novo, rss_novo, tempo_novo = medir("compacto", caminho)
+
+            print(f"\n{extensao}:")
+            print(f"float64: tracemalloc {traced_antigo / 2 ** 20:.1f} MiB, RSS {rss_antigo / 2 ** 20:.1f} MiB, "
+                  f"{tempo_antigo:.2f} s")
+            print(f"compacto: tracemalloc {traced_novo / 2 ** 20:.1f} MiB, RSS {rss_novo / 2 ** 20:.1f} MiB, "
+                  f"{tempo_novo:.2f} s")
+            print(f"Redução do pico: tracemalloc {traced_antigo / traced_novo:.1f}x, RSS {rss_antigo / rss_novo:.1f}x")
+            print(f"Contornos idênticos: {np.array_equal(antigo, novo)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,49 @@
 
 import os
 import sys
+from collections import Counter
 from datetime import datetime
 
 import imageio
 import nibabel as nib
 import numpy as np
 from PIL import Image
-from scipy.ndimage import binary_erosion, generate_binary_structure
+from scipy.ndimage import binary_dilation, binary_erosion, generate_binary_structure
+
+
+# Dependência entre pastas: o backend "bits" (--bits) usa o módulo MorfologiaBits,
+# que fica em "Trabalho final/Python" porque é compartilhado com a Abertura do
+# trabalho final. Ele só é importado quando esse backend é pedido; o padrão (scipy)
+# funciona com esta pasta sozinha.
+PASTA_MORFOLOGIA_BITS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Trabalho final", "Python")
+
+
+def _morfologia_bits():
+    try:
+        import MorfologiaBits
+    except ImportError:
+        if not os.path.isfile(os.path.join(PASTA_MORFOLOGIA_BITS, "MorfologiaBits.py")):
+            raise ImportError("o backend 'bits' precisa de 'Trabalho final/Python/MorfologiaBits.py' "
+                              "ao lado desta pasta (ou no PYTHONPATH)")
+        sys.path.append(PASTA_MORFOLOGIA_BITS)
+        import MorfologiaBits
+    return MorfologiaBits
 
 
 class ProcessadorDeImagens:
-    def __init__(self, caminho_entrada):
+    def __init__(self, caminho_entrada, backend="scipy"):
+        if backend not in ("scipy", "bits"):
+            raise ValueError("backend deve ser 'scipy' ou 'bits'")
         self.caminho_entrada = caminho_entrada
+        self.backend = backend
         self.diretorio_saida = f"saida_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.imagem_original = None
         self.imagem_atual = None
         self.eh_3d = False
+        self.minimo = None
+        self.maximo = None
+        self.expressao_atual = ("imagem",)
+        self._resultados = {}
 
     def carregar_imagem(self):
         try:
@@ -26,7 +53,10 @@ class ProcessadorDeImagens:
 
             if self.caminho_entrada.lower().endswith(('.nii', '.nii.gz')):
                 img = nib.load(self.caminho_entrada)
-                dados = img.get_fdata()
+                # Tipo nativo do arquivo (int16, uint8...) em vez do float64 de get_fdata
+                dados = np.asanyarray(img.dataobj)
+                if dados.dtype == np.float64:
+                    dados = dados.astype(np.float32)
                 if dados.ndim == 2:
                     dados = dados[..., np.newaxis] 
                 self.imagem_original = dados
@@ -38,9 +68,13 @@ class ProcessadorDeImagens:
                 self.imagem_original = np.array(img)
                 self.eh_3d = False
 
-            self.imagem_original = (self.imagem_original - np.min(self.imagem_original)) / (
-                    np.max(self.imagem_original) - np.min(self.imagem_original) + 1e-8)
-            self.imagem_atual = self.imagem_original.copy()
+            # A normalização para [0, 1] não é materializada: guardamos só o mínimo
+            # e o máximo e convertemos os limiares para a escala original
+            self.minimo = self.imagem_original.min()
+            self.maximo = self.imagem_original.max()
+            self.imagem_atual = self.imagem_original
+            self.expressao_atual = ("imagem",)
+            self._resultados = {}
 
             print(f"Imagem {'3D' if self.eh_3d else '2D'} carregada. Dimensões: {self.imagem_original.shape}")
             return True
@@ -55,10 +89,10 @@ class ProcessadorDeImagens:
             caminho_saida = os.path.join(self.diretorio_saida, f"etapa_{etapa}")
 
             if self.eh_3d:
-                nib.save(nib.Nifti1Image(self.imagem_atual, np.eye(4)), f"{caminho_saida}.nii.gz")
+                dados = self.imagem_atual.view(np.uint8) if self.imagem_atual.dtype == bool else self.imagem_atual
+                nib.save(nib.Nifti1Image(dados, np.eye(4)), f"{caminho_saida}.nii.gz")
             else:
-                img_2d = (np.squeeze(self.imagem_atual) * 255).astype(np.uint8)
-                imageio.imwrite(f"{caminho_saida}.png", img_2d)
+                imageio.imwrite(f"{caminho_saida}.png", self._para_8_bits(np.squeeze(self.imagem_atual)))
 
             print(f"Etapa {etapa} salva em: {caminho_saida}")
             return True
@@ -66,9 +100,142 @@ class ProcessadorDeImagens:
             print(f"ERRO AO SALVAR: {str(e)}")
             return False
 
+    @staticmethod
+    def _corte(minimo, maximo, limiar):
+        # Valor na escala original equivalente a (v - min) / (max - min + 1e-8) > limiar
+        return minimo + limiar * (float(maximo) - float(minimo) + 1e-8)
+
+    def _para_8_bits(self, imagem):
+        if imagem.dtype == bool:
+            return imagem.astype(np.uint8) * 255
+        escala = 255 / (float(self.maximo) - float(self.minimo) + 1e-8)
+        return ((imagem - self.minimo) * escala).astype(np.uint8)
+
+    # Cada resultado é descrito por uma expressão (tupla). Numa avaliação, um nó usado
+    # por mais de um consumidor é calculado uma vez e guardado em self._resultados só
+    # até o último consumidor terminar; entre etapas fica guardado apenas o resultado
+    # pedido, que é a imagem atual e a entrada da etapa seguinte:
+    #   ("imagem",)                 intensidades carregadas
+    #   ("mascara", limiar)         imagem binarizada no limiar (escala [0, 1])
+    #   ("erosao", entrada, n)      n erosões seguidas da entrada
+    #   ("dilatacao", entrada, n)   n dilatações seguidas da entrada
+    #   ("abertura", entrada, n)    n erosões e depois n dilatações
+    #   ("fechamento", entrada, n)  n dilatações e depois n erosões
+    #   ("gradiente", entrada)      dilatação menos erosão
+    #   ("contornos", entrada)      entrada menos a sua erosão
+    def avaliar(self, expressao):
+        expressao = self._normalizar(expressao)
+        referencias = Counter()
+        self._contar_referencias(expressao, referencias, set())
+        resultado = self._avaliar(expressao, referencias)
+        self._resultados = {expressao: resultado}
+        return resultado
+
+    def _dependencias(self, expressao):
+        operacao = expressao[0]
+        if operacao in ("imagem", "mascara"):
+            return []
+        if operacao in ("erosao", "dilatacao"):
+            _, entrada, iteracoes = expressao
+            return [self._normalizar((operacao, entrada, iteracoes - 1))]
+        if operacao == "abertura":
+            _, entrada, iteracoes = expressao
+            return [self._normalizar(("dilatacao", ("erosao", entrada, iteracoes), iteracoes))]
+        if operacao == "fechamento":
+            _, entrada, iteracoes = expressao
+            return [self._normalizar(("erosao", ("dilatacao", entrada, iteracoes), iteracoes))]
+        if operacao == "gradiente":
+            return [self._normalizar(("dilatacao", expressao[1], 1)), self._normalizar(("erosao", expressao[1], 1))]
+        if operacao == "contornos":
+            return [expressao[1], self._normalizar(("erosao", expressao[1], 1))]
+        raise ValueError(f"operação desconhecida: {operacao}")
+
+    def _contar_referencias(self, expressao, referencias, visitadas):
+        # Cada nó é calculado uma vez, então os filhos só são percorridos na primeira
+        # visita; os de um nó já guardado nem chegam a ser calculados
+        if expressao in visitadas:
+            return
+        visitadas.add(expressao)
+        if expressao in self._resultados:
+            return
+        for filho in self._dependencias(expressao):
+            referencias[filho] += 1
+            self._contar_referencias(filho, referencias, visitadas)
+
+    def _avaliar(self, expressao, referencias):
+        if expressao in self._resultados:
+            return self._resultados[expressao]
+
+        filhos = self._dependencias(expressao)
+        valores = [self._avaliar(filho, referencias) for filho in filhos]
+
+        operacao = expressao[0]
+        if operacao == "imagem":
+            resultado = self.imagem_original
+        elif operacao == "mascara":
+            resultado = self.imagem_original > self._corte(self.minimo, self.maximo, expressao[1])
+        elif operacao in ("erosao", "dilatacao"):
+            funcao = self._erosao if operacao == "erosao" else self._dilatacao
+            resultado = funcao(valores[0], self._estrutura())
+        elif operacao in ("abertura", "fechamento"):
+            resultado = valores[0]
+        else:
+            # gradiente e contornos: primeiro operando menos o segundo
+            resultado = valores[0] & ~valores[1]
+        del valores
+
+        for filho in filhos:
+            referencias[filho] -= 1
+            if referencias[filho] <= 0:
+                self._resultados.pop(filho, None)
+        if referencias[expressao] > 1:
+            self._resultados[expressao] = resultado
+        return resultado
+
+    def _normalizar(self, expressao):
+        operacao = expressao[0]
+        if operacao in ("erosao", "dilatacao", "abertura", "fechamento", "gradiente", "contornos"):
+            entrada = self._normalizar(expressao[1])
+            # As operações morfológicas trabalham sobre máscaras; aplicadas às
+            # intensidades, usam a binarização em 0.5 como as etapas originais
+            if entrada == ("imagem",) and self.imagem_original.dtype != bool:
+                entrada = ("mascara", 0.5)
+            if operacao in ("erosao", "dilatacao"):
+                iteracoes = expressao[2]
+                if iteracoes == 0:
+                    return entrada
+                # erosao(erosao(x, a), b) é a mesma coisa que erosao(x, a + b)
+                if entrada[0] == operacao:
+                    return (operacao, entrada[1], entrada[2] + iteracoes)
+                return (operacao, entrada, iteracoes)
+            return (operacao, entrada) + tuple(expressao[2:])
+        return tuple(expressao)
+
+    def _estrutura(self):
+        return generate_binary_structure(3 if self.eh_3d else 2, 2)
+
+    def _erosao(self, mascara, estrutura):
+        if self.backend == "bits":
+            # borda=False: fora do volume conta como 0, igual ao binary_erosion
+            return _morfologia_bits().erodir(mascara, estrutura, borda=False)
+        return binary_erosion(mascara, structure=estrutura)
+
+    def _dilatacao(self, mascara, estrutura):
+        if self.backend == "bits":
+            return _morfologia_bits().dilatar(mascara, estrutura)
+        return binary_dilation(mascara, structure=estrutura)
+
+    def limpar_resultados(self):
+        self._resultados = {}
+
+    def _aplicar(self, expressao):
+        self.expressao_atual = self._normalizar(expressao)
+        self.imagem_atual = self.avaliar(self.expressao_atual)
+
     def binarizar(self, limiar=0.5):
         try:
-            self.imagem_atual = (self.imagem_atual > limiar).astype(np.uint8)
+            if self.expressao_atual == ("imagem",):
+                self._aplicar(("mascara", limiar))
             return True
         except Exception as e:
             print(f"ERRO NA BINARIZAÇÃO: {str(e)}")
@@ -76,11 +243,7 @@ class ProcessadorDeImagens:
 
     def erodir(self):
         try:
-            dim = 3 if self.eh_3d else 2
-            estrutura = generate_binary_structure(dim, 2)
-
-            binaria_img = (self.imagem_atual > 0.5).astype(np.uint8)
-            self.imagem_atual = binary_erosion(binaria_img, structure=estrutura)
+            self._aplicar(("erosao", self.expressao_atual, 1))
             return True
         except Exception as e:
             print(f"ERRO NA EROSÃO: {str(e)}")
@@ -88,28 +251,110 @@ class ProcessadorDeImagens:
 
     def detectar_contornos(self):
         try:
-            binaria_img = (self.imagem_atual > 0.5).astype(np.uint8)
+            self._aplicar(("contornos", self.expressao_atual))
+            return True
+        except Exception as e:
+            print(f"ERRO NOS CONTORNOS: {str(e)}")
+            return False
+
+    def _abrir_saida_nifti(self, etapa, formato):
+        # Grava só o cabeçalho; os dados são acrescentados fatia a fatia depois.
+        # Em ordem Fortran o eixo z é o mais externo, então cada bloco de fatias
+        # consecutivas ocupa um trecho contíguo do arquivo
+        cabecalho = nib.Nifti1Image(np.zeros((1, 1, 1), np.uint8), np.eye(4)).header.copy()
+        cabecalho.set_data_shape(formato)
+        cabecalho['vox_offset'] = 352
+
+        arquivo = open(os.path.join(self.diretorio_saida, f"etapa_{etapa}.nii"), "wb")
+        cabecalho.write_to(arquivo)
+        arquivo.write(b"\x00" * (352 - arquivo.tell()))
+        return arquivo
+
+    def processar_em_fatias(self, espessura=16, limiar=0.5):
+        try:
+            if not os.path.isfile(self.caminho_entrada):
+                raise FileNotFoundError(f"ERRO: arquivo não encontrado.")
+            if not self.caminho_entrada.lower().endswith(('.nii', '.nii.gz')):
+                raise ValueError("o processamento em fatias é só para volumes NIfTI")
+
+            # Resultados de um volume carregado antes não são usados aqui
+            self.limpar_resultados()
+
+            # O volume fica no proxy do nibabel (mapeado em memória quando o .nii não
+            # é comprimido); cada leitura de dataobj[..., z0:z1] traz só aquelas fatias
+            volume = nib.load(self.caminho_entrada).dataobj
+            formato = volume.shape if len(volume.shape) == 3 else volume.shape + (1,)
+            profundidade = formato[2]
 
-            dim = 3 if self.eh_3d else 2
-            estrutura = generate_binary_structure(dim, 2)
-            erodida = binary_erosion(binaria_img, structure=estrutura)
+            def ler(z0, z1):
+                if len(volume.shape) == 2:
+                    return np.asanyarray(volume)[..., np.newaxis]
+                return np.asanyarray(volume[..., z0:z1])
 
-            self.imagem_atual = binaria_img - erodida
+            minimo, maximo = np.inf, -np.inf
+            for z0 in range(0, profundidade, espessura):
+                bloco = ler(z0, min(z0 + espessura, profundidade))
+                minimo = min(minimo, bloco.min())
+                maximo = max(maximo, bloco.max())
+
+            corte = self._corte(minimo, maximo, limiar)
+            estrutura = generate_binary_structure(3, 2)
+
+            os.makedirs(self.diretorio_saida, exist_ok=True)
+            saidas = [self._abrir_saida_nifti(etapa, formato) for etapa in "123"]
+            try:
+                for z0 in range(0, profundidade, espessura):
+                    z1 = min(z0 + espessura, profundidade)
+
+                    # Duas erosões encadeadas (erosão e depois contornos da erodida)
+                    # precisam de duas fatias de margem de cada lado
+                    a0, a1 = max(0, z0 - 2), min(profundidade, z1 + 2)
+                    mascara = ler(a0, a1) > corte
+                    erodida = self._erosao(mascara, estrutura)
+                    contornos = erodida & ~self._erosao(erodida, estrutura)
+
+                    for saida, resultado in zip(saidas, (mascara, erodida, contornos)):
+                        saida.write(resultado[..., z0 - a0:z1 - a0].astype(np.uint8).tobytes(order='F'))
+            finally:
+                for saida in saidas:
+                    saida.close()
+
+            self.eh_3d = True
+            print(f"Volume processado em fatias de {espessura}. Dimensões: {formato}")
+            print(f"Etapas salvas em: {self.diretorio_saida}")
             return True
         except Exception as e:
-            print(f"ERRO NOS CONTORNOS: {str(e)}")
+            print(f"ERRO NO PROCESSAMENTO EM FATIAS: {str(e)}")
             return False
 
 
 def main():
     print("=== PROCESSADOR DE IMAGENS 3D ===")
 
-    if len(sys.argv) > 1:
-        caminho_entrada = sys.argv[1]
+    argumentos = sys.argv[1:]
+    espessura = None
+    if "--fatias" in argumentos:
+        posicao = argumentos.index("--fatias")
+        espessura = int(argumentos[posicao + 1])
+        del argumentos[posicao:posicao + 2]
+    backend = "scipy"
+    if "--bits" in argumentos:
+        backend = "bits"
+        argumentos.remove("--bits")
+
+    if argumentos:
+        caminho_entrada = argumentos[0]
     else:
         caminho_entrada = input("Digite o caminho da imagem (absoluto): ").strip('"')
 
-    processador = ProcessadorDeImagens(caminho_entrada)
+    processador = ProcessadorDeImagens(caminho_entrada, backend)
+
+    if espessura is not None:
+        if not processador.processar_em_fatias(espessura):
+            sys.exit(1)
+        print("\nSucesso!")
+        print(f"Resultados em: {os.path.abspath(processador.diretorio_saida)}")
+        return
 
     if not processador.carregar_imagem():
         input("\nPressione enter para sair...")
@@ -1,53 +1,240 @@
 # Felipe Bona, João Martinho
 
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import cv2
 import numpy as np
 
-def processar_imagem(caminho_imagem):
-    imagem_original = cv2.imread(caminho_imagem)
-    if imagem_original is None:
-        print("Não foi possível carregar a imagem :(")
-        return
+EXTENSOES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+CAMPOS_RELATORIO = ("caminho", "centro_x", "centro_y", "raio", "metodo", "tempo_s", "erro")
+
 
+def preprocessar(imagem_original):
     imagem_cinza = cv2.cvtColor(imagem_original, cv2.COLOR_BGR2GRAY)
     imagem_cinza = cv2.medianBlur(imagem_cinza, 9)
-    imagem_cinza = cv2.equalizeHist(imagem_cinza)
+    return cv2.equalizeHist(imagem_cinza)
+
 
+def _hough(imagem_cinza, distancia_minima, raio_minimo, raio_maximo):
     circulos = cv2.HoughCircles(
         imagem_cinza,
         cv2.HOUGH_GRADIENT,
         dp=1,
-        minDist=50,
+        minDist=distancia_minima,
         param1=100,
         param2=40,
-        minRadius=30,
-        maxRadius=150
+        minRadius=raio_minimo,
+        maxRadius=raio_maximo
     )
+    return None if circulos is None else circulos[0]
+
+
+def detectar_circulo(imagem_cinza, nivel_piramide=0, raio_minimo=30, raio_maximo=150, distancia_minima=50):
+    # Retorna (circulo, metodo); circulo é (x, y, raio) em float na resolução original
+    if nivel_piramide == 0:
+        circulos = _hough(imagem_cinza, distancia_minima, raio_minimo, raio_maximo)
+        return (None, None) if circulos is None else (circulos[0], "completa")
+
+    # Busca grosseira num nível reduzido da pirâmide: o acumulador fica escala² menor
+    reduzida = imagem_cinza
+    for _ in range(nivel_piramide):
+        reduzida = cv2.pyrDown(reduzida)
+    escala = 2 ** nivel_piramide
+
+    circulos = _hough(reduzida, distancia_minima / escala, max(1, int(raio_minimo / escala)),
+                      int(np.ceil(raio_maximo / escala)))
+    if circulos is None:
+        # Nada no nível reduzido: volta para a busca completa
+        return detectar_circulo(imagem_cinza, 0, raio_minimo, raio_maximo, distancia_minima)
+
+    x, y, raio = circulos[0] * escala
+
+    # Refinamento na resolução original, num recorte em volta do círculo grosseiro
+    # e numa janela estreita de raios
+    folga = max(2 * escala, 0.1 * raio)
+    margem = int(np.ceil(raio + 2 * folga)) + 2
+    altura, largura = imagem_cinza.shape[:2]
+    x0, y0 = max(0, int(x) - margem), max(0, int(y) - margem)
+    x1, y1 = min(largura, int(x) + margem + 1), min(altura, int(y) + margem + 1)
+
+    refinados = _hough(imagem_cinza[y0:y1, x0:x1], distancia_minima,
+                       max(raio_minimo, int(raio - folga)), min(raio_maximo, int(np.ceil(raio + folga))))
+    if refinados is not None:
+        refinados = refinados + np.array([x0, y0, 0], dtype=refinados.dtype)
+        proximos = refinados[np.hypot(refinados[:, 0] - x, refinados[:, 1] - y) <= folga]
+        if len(proximos):
+            return proximos[0], "piramide"
+
+    # O refinamento não confirmou: fica com o círculo grosseiro reescalado
+    return np.array([x, y, raio], dtype=np.float32), "grosseira"
+
+
+class CompositorIris:
+    # Pinta o anel da íris direto numa única imagem de saída, reaproveitada entre
+    # imagens do mesmo tamanho. Só o retângulo envolvente do círculo é percorrido;
+    # o resto da saída é apenas preenchido de branco.
+
+    def __init__(self):
+        self._saida = None
+        self._aneis = {}
+
+    def _anel(self, raio):
+        # Grade de distâncias ao quadrado ao centro, calculada uma vez por raio. O
+        # cv2.circle preenchido pinta exatamente os pixels com dx² + dy² <= raio²
+        if raio not in self._aneis:
+            dy, dx = np.ogrid[-raio:raio + 1, -raio:raio + 1]
+            distancias = dx * dx + dy * dy
+            raio_pupila = int(raio*0.35)
+            self._aneis[raio] = (distancias <= raio * raio) & (distancias > raio_pupila * raio_pupila)
+        return self._aneis[raio]
+
+    def compor(self, imagem_original, centro_x, centro_y, raio):
+        centro_x, centro_y, raio = int(centro_x), int(centro_y), int(raio)
+        if self._saida is None or self._saida.shape != imagem_original.shape:
+            self._saida = np.empty_like(imagem_original)
+        saida = self._saida
+        saida.fill(255)
+
+        # Recorte do anel para a parte do retângulo envolvente que cai dentro da imagem
+        altura, largura = imagem_original.shape[:2]
+        x0, y0 = max(0, centro_x - raio), max(0, centro_y - raio)
+        x1, y1 = min(largura, centro_x + raio + 1), min(altura, centro_y + raio + 1)
+        if x0 >= x1 or y0 >= y1:
+            return saida
+        anel = self._anel(raio)[y0 - (centro_y - raio):y1 - (centro_y - raio),
+                                x0 - (centro_x - raio):x1 - (centro_x - raio)]
+        if imagem_original.ndim == 3:
+            anel = anel[..., None]
+        np.copyto(saida[y0:y1, x0:x1], imagem_original[y0:y1, x0:x1], where=anel)
+        return saida
+
+
+_compositor = None
 
-    if circulos is not None:
-        circulos = np.uint16(np.around(circulos))
-        melhor_circulo = circulos[0][0]
-        centro_x, centro_y, raio = melhor_circulo[0], melhor_circulo[1], melhor_circulo[2]
 
-        mascara_iris = np.zeros(imagem_original.shape[:2], dtype=np.uint8)
-        cv2.circle(mascara_iris, (centro_x, centro_y), raio, 255, -1)
+def isolar_iris(imagem_original, centro_x, centro_y, raio):
+    # A imagem devolvida é o buffer do compositor do processo: é sobrescrita na próxima chamada
+    global _compositor
+    if _compositor is None:
+        _compositor = CompositorIris()
+    return _compositor.compor(imagem_original, centro_x, centro_y, raio)
 
-        mascara_pupila = np.zeros(imagem_original.shape[:2], dtype=np.uint8)
-        cv2.circle(mascara_pupila, (centro_x, centro_y), int(raio*0.35), 255, -1)
 
-        mascara_final = cv2.subtract(mascara_iris, mascara_pupila)
-        
-        iris_isolada = cv2.bitwise_and(imagem_original, imagem_original, mask=mascara_final)
+def caminho_saida(caminho_imagem, diretorio_saida=None):
+    base = os.path.splitext(caminho_imagem)[0]
+    if diretorio_saida:
+        base = os.path.join(diretorio_saida, os.path.basename(base))
+    return base + "_iris_isolada.png"
 
-        fundo_branco = np.full_like(imagem_original, 255)
-        resultado = cv2.bitwise_or(fundo_branco, fundo_branco, mask=cv2.bitwise_not(mascara_final))
-        resultado = cv2.add(resultado, iris_isolada)
 
-        nome_saida = caminho_imagem.split('.')[0] + "_iris_isolada.png"
-        cv2.imwrite(nome_saida, resultado)
+def processar_imagem(caminho_imagem, nivel_piramide=0, diretorio_saida=None):
+    linha = {"caminho": caminho_imagem, "erro": ""}
+    inicio = time.perf_counter()
+
+    imagem_original = cv2.imread(caminho_imagem)
+    if imagem_original is None:
+        linha["erro"] = "Não foi possível carregar a imagem :("
+        linha["tempo_s"] = round(time.perf_counter() - inicio, 4)
+        return linha
+
+    circulo, metodo = detectar_circulo(preprocessar(imagem_original), nivel_piramide)
+
+    if circulo is not None:
+        centro_x, centro_y, raio = np.uint16(np.around(circulo))
+        resultado = isolar_iris(imagem_original, centro_x, centro_y, raio)
+        cv2.imwrite(caminho_saida(caminho_imagem, diretorio_saida), resultado)
+        linha.update(centro_x=int(centro_x), centro_y=int(centro_y), raio=int(raio), metodo=metodo)
     else:
-        print("Não foi possível detectar a íris na imagem :(")
+        linha["erro"] = "Não foi possível detectar a íris na imagem :("
+
+    linha["tempo_s"] = round(time.perf_counter() - inicio, 4)
+    return linha
+
+
+def listar_imagens(entradas):
+    # Aceita diretórios (todas as imagens dentro) e arquivos avulsos
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for nome in sorted(os.listdir(entrada)):
+                if nome.lower().endswith(EXTENSOES) and not nome.lower().endswith("_iris_isolada.png"):
+                    caminhos.append(os.path.join(entrada, nome))
+        else:
+            caminhos.append(entrada)
+    return caminhos
+
+
+def _inicializar_trabalhador():
+    # Um processo por núcleo: o OpenCV não precisa abrir threads próprias
+    cv2.setNumThreads(1)
+
+
+def processar_lote(caminhos, trabalhadores=None, nivel_piramide=1, diretorio_saida=None, caminho_relatorio=None):
+    if diretorio_saida:
+        os.makedirs(diretorio_saida, exist_ok=True)
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+
+    arquivo = open(caminho_relatorio, "w", newline="", encoding="utf-8") if caminho_relatorio else None
+    escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_RELATORIO) if arquivo else None
+    if escritor:
+        escritor.writeheader()
+
+    linhas = []
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=trabalhadores, initializer=_inicializar_trabalhador) as executor:
+            futuros = [executor.submit(processar_imagem, caminho, nivel_piramide, diretorio_saida)
+                       for caminho in caminhos]
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                linha = futuro.result()
+                linhas.append(linha)
+                if escritor:
+                    escritor.writerow(linha)
+                    arquivo.flush()
+
+                if linha["erro"]:
+                    situacao = f"erro: {linha['erro']}"
+                else:
+                    situacao = (f"centro ({linha['centro_x']}, {linha['centro_y']}), raio {linha['raio']}, "
+                                f"{linha['metodo']}, {linha['tempo_s'] * 1000:.1f} ms")
+                print(f"[{concluidos}/{len(caminhos)}] {linha['caminho']}: {situacao}")
+    finally:
+        if arquivo:
+            arquivo.close()
+
+    duracao = time.perf_counter() - inicio
+    print(f"{len(caminhos)} imagens em {duracao:.2f} s com {trabalhadores} processos "
+          f"({len(caminhos) / duracao:.1f} imagens/s)")
+    return linhas
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Segmentação da íris em lote com a transformada de Hough.")
+    parser.add_argument("entradas", nargs="+", help="imagens ou diretórios de imagens")
+    parser.add_argument("-o", "--saida", default=None, help="diretório das imagens geradas (padrão: junto da entrada)")
+    parser.add_argument("-j", "--trabalhadores", type=int, default=None, help="número de processos (padrão: CPUs)")
+    parser.add_argument("--nivel", type=int, default=1,
+                        help="nível da pirâmide para a busca grosseira (0 = busca completa)")
+    parser.add_argument("--relatorio", default=None, help="arquivo .csv com o círculo e o tempo de cada imagem")
+    args = parser.parse_args()
+
+    caminhos = listar_imagens(args.entradas)
+    if not caminhos:
+        print("Nenhuma imagem encontrada.")
+        return
+    processar_lote(caminhos, args.trabalhadores, args.nivel, args.saida, args.relatorio)
+
 
 if __name__ == "__main__":
-    caminho = input("Digite o caminho da imagem: ")
-    processar_imagem(caminho)
+    if len(sys.argv) > 1:
+        principal()
+    else:
+        caminho = input("Digite o caminho da imagem: ")
+        linha = processar_imagem(caminho)
+        if linha["erro"]:
+            print(linha["erro"])
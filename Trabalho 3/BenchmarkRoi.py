@@ -0,0 +1,68 @@
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+
+from trabalho import (TAMANHO_INFERENCIA_PADRAO, ajustar_rois, formatos_dos_recortes, passo_do_modelo,
+                      processar_video)
+
+
+def pixels_por_quadro(modelo, largura, altura, rois=None, tamanho_inferencia=None):
+    # Pixels que chegam à rede por quadro: o quadro inteiro passa pelo letterbox do
+    # ultralytics; os recortes já saem de formatos_dos_recortes no tamanho da entrada
+    passo = passo_do_modelo(modelo)
+    if rois:
+        return sum(h * w for _, (h, w) in formatos_dos_recortes(rois, largura, altura, tamanho_inferencia, passo))
+    lado = tamanho_inferencia or TAMANHO_INFERENCIA_PADRAO
+    entrada = LetterBox((lado, lado), auto=True, stride=passo)(image=np.zeros((altura, largura, 3), np.uint8))
+    return entrada.shape[0] * entrada.shape[1]
+
+
+def medir(caminho_video, caminho_modelo, classes, tamanho_lote, rois, tamanho_inferencia, pasta):
+    # A primeira passada carrega o modelo e aquece a inferência; só a segunda é cronometrada
+    modelo = YOLO(caminho_modelo)
+    metricas = {}
+    for passada in range(2):
+        contagens = processar_video(caminho_video, modelo, None, classes, metricas=metricas,
+                                    tamanho_lote=tamanho_lote, rois=rois, tamanho_inferencia=tamanho_inferencia,
+                                    caminho_contagens=os.path.join(pasta, f"contagens{passada}.csv"))
+    return modelo, contagens, metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão do contador com o quadro inteiro e só com as ROIs.")
+    parser.add_argument("video", help="vídeo de entrada")
+    parser.add_argument("--modelo", default="yolov8n.pt", help="pesos (ou .yaml) do YOLO")
+    parser.add_argument("--roi", type=int, nargs=4, action="append", required=True,
+                        metavar=("X", "Y", "LARGURA", "ALTURA"), help="região de interesse (pode ser repetida)")
+    parser.add_argument("--imgsz", type=int, default=None, help="tamanho da imagem de entrada do modelo")
+    parser.add_argument("--lote", type=int, default=4, help="quadros por chamada ao modelo")
+    parser.add_argument("--classes", nargs="+", default=["car", "truck", "bus", "van"])
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    largura, altura = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    rois = ajustar_rois(args.roi, largura, altura)
+
+    vazoes = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, regioes in (("quadro inteiro", None), ("ROIs", rois)):
+            modelo, contagens, metricas = medir(args.video, args.modelo, args.classes, args.lote, regioes,
+                                                args.imgsz, pasta)
+            pixels = pixels_por_quadro(modelo, largura, altura, regioes, args.imgsz)
+            vazoes[nome] = (metricas["fps"], pixels)
+            print(f"{nome}: {pixels} pixels/quadro na entrada, {metricas['quadros']} quadros, "
+                  f"{metricas['fps']:.1f} FPS, utilização da inferência {metricas['utilizacao']['inferencia']:.0%}")
+            print(f"  contagens: {contagens}")
+
+    (fps_inteiro, pixels_inteiro), (fps_rois, pixels_rois) = vazoes.values()
+    print(f"ROIs: {pixels_inteiro / pixels_rois:.2f}x menos pixels, vazão {fps_rois / fps_inteiro:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,805 @@
 # Felipe Bona, João Martinho
 
 # Importação das bibliotecas necessárias
+import argparse  # Argumentos de linha de comando
+import csv  # Escrita incremental das contagens por quadro
+import os  # Verificação e reparo do CSV na retomada
+from collections import OrderedDict  # Trilhas ativas em ordem de última aparição
+import queue  # Filas limitadas entre as etapas do pipeline
+import threading  # Threads de decodificação e codificação
+import time  # Medição do tempo de cada etapa
+
 import cv2  # OpenCV para processamento de vídeo e imagens
+import numpy as np  # Polígono da zona de contagem
 from ultralytics import YOLO  # YOLO para detecção de objetos
-import pandas as pd  # Pandas para manipulação de dados e exportação para CSV
+import pandas as pd  # Pandas para somar as contagens já gravadas ao retomar um processamento
+
+FIM = None  # Marca o fim do fluxo de quadros numa fila
+CAMINHO_CONTAGENS = "object_counts_per_frame.csv"  # Arquivo padrão das contagens por quadro
+CAMINHO_JANELAS = "unique_counts_per_window.csv"  # Arquivo padrão dos veículos únicos por janela
+TAMANHO_INFERENCIA_PADRAO = 640  # Lado da entrada do YOLO quando --imgsz não é dado
+PASSO_PADRAO = 32  # Maior stride dos modelos YOLO; as entradas têm lados múltiplos dele
+CINZA_LETTERBOX = (114, 114, 114)  # Cor do preenchimento usada pelo ultralytics
+
+
+def extrair_deteccoes(resultados, modelo, classes_a_rastrear):
+    """
+    Converte os resultados do YOLO numa lista simples de detecções das classes desejadas.
+
+    Args:
+        resultados (list): Resultados retornados por modelo.track
+        modelo (YOLO): Modelo usado na detecção (fornece os nomes das classes)
+        classes_a_rastrear (list): Lista de classes de objetos a serem rastreadas
+
+    Returns:
+        list: Tuplas (classe, x1, y1, x2, y2, id_rastreio); id_rastreio é None sem rastreamento
+    """
+    deteccoes = []
+    for resultado in resultados:
+        caixas = resultado.boxes
+        if caixas is None or len(caixas) == 0:
+            continue
+
+        # Copia os tensores para a CPU de uma vez, em vez de caixa por caixa
+        classes = caixas.cls.cpu().numpy().astype(int)
+        coordenadas = caixas.xyxy.cpu().numpy().astype(int)
+        ids = caixas.id.cpu().numpy().astype(int) if caixas.id is not None else [None] * len(classes)
 
-def processar_video(caminho_video, modelo, caminho_saida, classes_a_rastrear):
+        for indice_cls, (x1, y1, x2, y2), id_rastreio in zip(classes, coordenadas, ids):
+            nome_cls = modelo.names[int(indice_cls)]  # Obtém o nome da classe
+            if nome_cls in classes_a_rastrear:
+                id_rastreio = int(id_rastreio) if id_rastreio is not None else None
+                deteccoes.append((nome_cls, int(x1), int(y1), int(x2), int(y2), id_rastreio))
+    return deteccoes
+
+
+class RastreadorEmLote:
+    """
+    Rastreador aplicado quadro a quadro sobre detecções feitas em lote.
+
+    Reproduz o que modelo.track faz depois da detecção: associa as caixas às trilhas
+    existentes e devolve o resultado com o id de rastreamento de cada caixa.
+    """
+
+    def __init__(self, configuracao="botsort.yaml"):
+        from ultralytics.trackers.track import TRACKER_MAP
+        from ultralytics.utils import IterableSimpleNamespace
+        from ultralytics.utils.checks import check_yaml
+        try:
+            from ultralytics.utils import YAML
+            carregar_yaml = YAML.load
+        except ImportError:  # Versões antigas do ultralytics
+            from ultralytics.utils import yaml_load as carregar_yaml
+
+        parametros = IterableSimpleNamespace(**carregar_yaml(check_yaml(configuracao)))
+        if parametros.tracker_type not in ("bytetrack", "botsort"):
+            raise ValueError(f"Rastreador não suportado no modo em lote: {parametros.tracker_type}")
+        self.rastreador = TRACKER_MAP[parametros.tracker_type](args=parametros)
+
+    def atualizar(self, resultado):
+        """Atualiza as trilhas com as detecções de um quadro e devolve o resultado rastreado."""
+        import torch
+
+        trilhas = self.rastreador.update(resultado.boxes.cpu().numpy(), resultado.orig_img)
+        if len(trilhas) == 0:
+            # Trilhas novas ainda não confirmadas não aparecem, como no modelo.track
+            if any(not trilha.is_activated for trilha in self.rastreador.tracked_stracks):
+                return resultado[:0]
+            return resultado
+
+        # Colunas: x1, y1, x2, y2, id, confiança, classe, índice da detecção
+        resultado = resultado[trilhas[:, -1].astype(int)]
+        resultado.update(boxes=torch.as_tensor(trilhas[:, :-1], device=resultado.boxes.data.device))
+        return resultado
+
+
+def ajustar_rois(rois, largura_quadro, altura_quadro):
+    """Limita cada região de interesse (x, y, largura, altura) às bordas do quadro."""
+    ajustadas = []
+    for x, y, largura, altura in rois:
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(largura_quadro, int(x + largura)), min(altura_quadro, int(y + altura))
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"Região de interesse fora do quadro: {(x, y, largura, altura)}")
+        ajustadas.append((x0, y0, x1 - x0, y1 - y0))
+    return ajustadas
+
+
+def passo_do_modelo(modelo):
+    """Maior stride do modelo (32 nos YOLO de detecção), ou PASSO_PADRAO se o modelo não o expõe."""
+    try:
+        return int(max(modelo.model.stride))
+    except (AttributeError, TypeError):
+        return PASSO_PADRAO
+
+
+def formatos_dos_recortes(rois, largura_quadro, altura_quadro, tamanho_inferencia=None, passo=PASSO_PADRAO):
+    """
+    Calcula, para cada região de interesse, o tamanho do recorte reduzido e da entrada do modelo.
+
+    O recorte é reduzido na mesma escala em que o quadro inteiro seria reduzido para a entrada do
+    modelo (nunca ampliado) e completado até lados múltiplos do passo. Assim o ultralytics não
+    redimensiona nem completa o recorte até tamanho_inferencia, e o modelo processa só os pixels
+    da região, na resolução que teriam no quadro inteiro.
+
+    Args:
+        rois (list): Regiões de interesse (x, y, largura, altura), já ajustadas ao quadro
+        largura_quadro (int): Largura do quadro inteiro
+        altura_quadro (int): Altura do quadro inteiro
+        tamanho_inferencia (int): Lado da entrada do modelo para o quadro inteiro
+        passo (int): Stride do modelo
+
+    Returns:
+        list: Pares ((largura, altura) do recorte reduzido, (altura, largura) da entrada do modelo)
+    """
+    escala = min(1.0, (tamanho_inferencia or TAMANHO_INFERENCIA_PADRAO) / max(largura_quadro, altura_quadro))
+    formatos = []
+    for _, _, largura, altura in rois:
+        reduzido = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+        entrada = (-(-reduzido[1] // passo) * passo, -(-reduzido[0] // passo) * passo)
+        formatos.append((reduzido, entrada))
+    return formatos
+
+
+def preparar_recorte(quadro, roi, formato):
+    """Recorta a região, reduz ao tamanho do formato e completa com cinza até a entrada do modelo."""
+    x, y, largura, altura = roi
+    (largura_reduzida, altura_reduzida), (altura_entrada, largura_entrada) = formato
+    recorte = quadro[y:y + altura, x:x + largura]
+    if (largura_reduzida, altura_reduzida) != (largura, altura):
+        recorte = cv2.resize(recorte, (largura_reduzida, altura_reduzida), interpolation=cv2.INTER_AREA)
+    return cv2.copyMakeBorder(recorte, 0, altura_entrada - altura_reduzida, 0, largura_entrada - largura_reduzida,
+                              cv2.BORDER_CONSTANT, value=CINZA_LETTERBOX)
+
+
+def juntar_recortes(quadro, resultados_recortes, rois, nomes, iou=0.7, formatos=None):
+    """
+    Junta as detecções feitas nos recortes das regiões de interesse num único resultado do quadro.
+
+    As caixas são levadas de volta às coordenadas do quadro inteiro e, como as regiões podem se
+    sobrepor, as duplicatas são eliminadas com NMS por classe.
+
+    Args:
+        quadro (ndarray): Quadro inteiro
+        resultados_recortes (list): Resultados de modelo.predict, um por região, na ordem de rois
+        rois (list): Regiões de interesse (x, y, largura, altura)
+        nomes (dict): Nomes das classes do modelo
+        iou (float): Sobreposição a partir da qual duas caixas da mesma classe são a mesma detecção
+        formatos (list): Formatos de formatos_dos_recortes, se os recortes foram reduzidos e completados
+
+    Returns:
+        Results: Resultado com as caixas (x1, y1, x2, y2, confiança, classe) no quadro inteiro
+    """
+    import torch
+    import torchvision
+    from ultralytics.engine.results import Results
+
+    partes = []
+    for indice, (resultado, (x, y, largura, altura)) in enumerate(zip(resultados_recortes, rois)):
+        dados = resultado.boxes.data[:, :6].clone()
+        if formatos is not None:
+            # Desfaz a redução e descarta a parte das caixas que cai no preenchimento
+            largura_reduzida, altura_reduzida = formatos[indice][0]
+            dados[:, [0, 2]] = (dados[:, [0, 2]] * (largura / largura_reduzida)).clamp(0, largura)
+            dados[:, [1, 3]] = (dados[:, [1, 3]] * (altura / altura_reduzida)).clamp(0, altura)
+        dados[:, [0, 2]] += x
+        dados[:, [1, 3]] += y
+        partes.append(dados)
+    dados = torch.cat(partes) if partes else torch.zeros((0, 6))
+
+    if len(rois) > 1 and len(dados):
+        manter = torchvision.ops.batched_nms(dados[:, :4], dados[:, 4], dados[:, 5].int(), iou)
+        dados = dados[manter.sort().values]
+    return Results(quadro, path="", names=nomes, boxes=dados)
+
+
+def criar_inferencia(modelo, classes_a_rastrear, tamanho_lote=1, rastreador="botsort.yaml", rois=None,
+                     tamanho_inferencia=None, tamanho_quadro=None):
+    """
+    Cria a função que recebe uma lista de quadros e devolve, para cada um, o par
+    (detecções, inferido); inferido indica se o quadro passou de fato pelo modelo.
+
+    Com tamanho_lote 1 cada quadro passa por modelo.track, como antes. Com lotes maiores a
+    detecção é feita de uma só vez com modelo.predict sobre todos os quadros do lote, e o
+    rastreamento é aplicado depois, quadro a quadro e em ordem, para manter os ids.
+
+    Com regiões de interesse, só os recortes delas vão para o modelo, na escala que teriam no
+    quadro inteiro (ver formatos_dos_recortes); os recortes de mesmo formato do lote vão numa
+    única chamada. As caixas voltam às coordenadas do quadro antes do rastreamento.
+    O filtro de classes é feito pelo próprio modelo, que descarta as demais já na detecção.
+
+    tamanho_quadro, (largura, altura), é obrigatório com regiões de interesse.
+    """
+    # Índices das classes desejadas; classes que o modelo não conhece são ignoradas
+    opcoes = {"classes": [indice for indice, nome in modelo.names.items() if nome in classes_a_rastrear]}
+    if tamanho_inferencia:
+        opcoes["imgsz"] = tamanho_inferencia
+
+    if rois:
+        # Cada recorte já tem o tamanho exato da entrada; as regiões de mesmo formato formam um grupo
+        formatos = formatos_dos_recortes(rois, *tamanho_quadro, tamanho_inferencia, passo_do_modelo(modelo))
+        grupos = {}
+        for indice, (_, entrada) in enumerate(formatos):
+            grupos.setdefault(entrada, []).append(indice)
+
+    if tamanho_lote <= 1 and not rois:
+        def inferir(lote):
+            return [(extrair_deteccoes(modelo.track(quadro, persist=True, **opcoes), modelo, classes_a_rastrear),
+                     True)
+                    for quadro in lote]
+        return inferir
+
+    rastreador_lote = RastreadorEmLote(rastreador)
+
+    def inferir(lote):
+        if rois:
+            brutos = [[None] * len(rois) for _ in lote]
+            for entrada, indices in grupos.items():
+                recortes = [preparar_recorte(quadro, rois[i], formatos[i]) for quadro in lote for i in indices]
+                saidas = modelo.predict(recortes, verbose=False, **{**opcoes, "imgsz": list(entrada)})
+                for posicao, resultado in enumerate(saidas):
+                    brutos[posicao // len(indices)][indices[posicao % len(indices)]] = resultado
+            resultados = [juntar_recortes(quadro, brutos[i], rois, modelo.names, formatos=formatos)
+                          for i, quadro in enumerate(lote)]
+        else:
+            resultados = modelo.predict(lote, verbose=False, **opcoes)
+        return [(extrair_deteccoes([rastreador_lote.atualizar(resultado)], modelo, classes_a_rastrear), True)
+                for resultado in resultados]
+    return inferir
+
+
+class FiltroDeMovimento:
+    """
+    Decide se um quadro precisa passar pelo modelo comparando-o com o último quadro analisado.
+
+    A comparação é uma diferença absoluta (cv2.absdiff, como em Subtrair.subtrair_imagens)
+    entre versões reduzidas e em tons de cinza dos quadros. Se a fração de pixels alterados
+    ficar abaixo do limiar, o quadro reaproveita as detecções anteriores.
+    """
+
+    def __init__(self, limiar_movimento=0.002, max_pulados=15, escala=0.25, limiar_pixel=25):
+        """
+        Args:
+            limiar_movimento (float): Fração mínima de pixels alterados para rodar o modelo
+            max_pulados (int): Máximo de quadros seguidos sem inferência (limite de segurança)
+            escala (float): Fator de redução dos quadros antes da comparação
+            limiar_pixel (int): Diferença de intensidade a partir da qual um pixel conta como alterado
+        """
+        self.limiar_movimento = limiar_movimento
+        self.max_pulados = max_pulados
+        self.escala = escala
+        self.limiar_pixel = limiar_pixel
+        self.referencia = None  # Versão reduzida do último quadro analisado
+        self.pulados = 0
+
+    def _reduzir(self, quadro):
+        cinza = cv2.cvtColor(quadro, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(cinza, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+
+    def precisa_inferir(self, quadro):
+        """Retorna True se o quadro deve passar pelo modelo (e o torna a nova referência)."""
+        reduzido = self._reduzir(quadro)
+        if self.referencia is not None and self.pulados < self.max_pulados:
+            diferenca = cv2.absdiff(self.referencia, reduzido)
+            movimento = cv2.countNonZero(cv2.threshold(diferenca, self.limiar_pixel, 255, cv2.THRESH_BINARY)[1])
+            if movimento < self.limiar_movimento * diferenca.size:
+                self.pulados += 1
+                return False
+
+        self.referencia = reduzido
+        self.pulados = 0
+        return True
+
+
+def aplicar_filtro_de_movimento(inferir, filtro):
+    """
+    Envolve a função de inferência para rodar o modelo só nos quadros com movimento.
+
+    Os quadros sem movimento repetem as detecções (caixas e ids) do último quadro inferido.
+    O rastreador não é atualizado nesses quadros: as trilhas seguem como estavam.
+    """
+    ultimas = []
+
+    def inferir_com_filtro(lote):
+        nonlocal ultimas
+        decisoes = [filtro.precisa_inferir(quadro) for quadro in lote]
+        selecionados = [quadro for quadro, decisao in zip(lote, decisoes) if decisao]
+        inferidos = iter(inferir(selecionados) if selecionados else [])
+
+        saida = []
+        for decisao in decisoes:
+            if decisao:
+                ultimas, _ = next(inferidos)
+            saida.append((ultimas, decisao))
+        return saida
+    return inferir_com_filtro
+
+
+def _orientacao(a, b, c):
+    """Sinal do produto vetorial (b - a) x (c - a): de que lado da reta ab está o ponto c."""
+    valor = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (valor > 0) - (valor < 0)
+
+
+def _cruzou(anterior, atual, inicio_linha, fim_linha):
+    """Verifica se o deslocamento anterior -> atual atravessa o segmento da linha de contagem."""
+    return (_orientacao(inicio_linha, fim_linha, anterior) * _orientacao(inicio_linha, fim_linha, atual) < 0 and
+            _orientacao(anterior, atual, inicio_linha) * _orientacao(anterior, atual, fim_linha) < 0)
+
+
+class ContadorUnico:
+    """
+    Conta veículos únicos pelos ids de rastreamento, em vez de somar caixas quadro a quadro.
+
+    Cada id é contado uma única vez: quando aparece pela primeira vez, quando o ponto de
+    referência da caixa (centro da base) atravessa a linha de contagem ou quando entra na
+    zona de contagem. Só as trilhas ativas ficam em memória; as que não aparecem há mais de
+    max_inativo quadros são descartadas. Cada janela encerrada vai para o escritor de janelas,
+    se houver, e só os totais ficam em memória, então o uso de memória não cresce com a
+    duração do vídeo.
+    """
+
+    def __init__(self, classes, linha=None, zona=None, janela_s=60.0, max_inativo=90, escritor_janelas=None):
+        """
+        Args:
+            classes (list): Classes contadas
+            linha (tuple): ((x1, y1), (x2, y2)) da linha de contagem, opcional
+            zona (list): Vértices [(x, y), ...] do polígono de contagem, opcional
+            janela_s (float): Duração de cada janela de tempo do relatório, em segundos
+            max_inativo (int): Quadros sem aparecer até uma trilha ser descartada; deve ser
+                maior que o buffer do rastreador, para o mesmo id não voltar depois de descartado
+            escritor_janelas (EscritorContagens): Recebe os totais de cada janela encerrada, com as
+                colunas inicio_s e as classes; sem ele, só os totais do vídeo inteiro são mantidos
+        """
+        if linha is not None and zona is not None:
+            raise ValueError("Use linha ou zona de contagem, não as duas")
+        self.classes = list(classes)
+        self.linha = linha
+        self.zona = np.array(zona, dtype=np.int32) if zona is not None else None
+        self.janela_s = janela_s
+        self.max_inativo = max_inativo
+
+        self.ativos = OrderedDict()  # id -> [classe, último quadro, último ponto, já contado]
+        self.totais = {cls: 0 for cls in self.classes}
+        self.janela_atual = 0
+        self.contagem_janela = {cls: 0 for cls in self.classes}
+        self.escritor_janelas = escritor_janelas
+        self.janelas_encerradas = 0
+
+    def _dentro_da_zona(self, ponto):
+        return cv2.pointPolygonTest(self.zona, (float(ponto[0]), float(ponto[1])), False) >= 0
+
+    def _evento(self, anterior, ponto, primeira_vez):
+        """Decide se a observação atual da trilha gera uma contagem."""
+        if self.linha is not None:
+            return anterior is not None and _cruzou(anterior, ponto, *self.linha)
+        if self.zona is not None:
+            return self._dentro_da_zona(ponto) and (anterior is None or not self._dentro_da_zona(anterior))
+        return primeira_vez
+
+    def _gravar_janela(self):
+        if self.escritor_janelas is not None:
+            self.escritor_janelas.escrever({"inicio_s": self.janela_atual * self.janela_s, **self.contagem_janela})
+        self.janelas_encerradas += 1
+        self.contagem_janela = {cls: 0 for cls in self.classes}
+
+    def _fechar_janelas(self, tempo_s):
+        janela = int(tempo_s // self.janela_s) if self.janela_s else 0
+        while janela > self.janela_atual:
+            self._gravar_janela()
+            self.janela_atual += 1
+
+    def atualizar(self, indice_quadro, tempo_s, deteccoes):
+        """
+        Registra as detecções rastreadas de um quadro.
+
+        Args:
+            indice_quadro (int): Índice do quadro no vídeo
+            tempo_s (float): Instante do quadro, em segundos
+            deteccoes (list): Detecções (classe, x1, y1, x2, y2, id_rastreio) do quadro
+        """
+        self._fechar_janelas(tempo_s)
+
+        for nome_cls, x1, y1, x2, y2, id_rastreio in deteccoes:
+            if id_rastreio is None or nome_cls not in self.totais:
+                continue  # Sem id não há como saber se o veículo já foi contado
+            ponto = ((x1 + x2) / 2, y2)
+            trilha = self.ativos.pop(id_rastreio, None)
+            primeira_vez = trilha is None
+            if primeira_vez:
+                trilha = [nome_cls, indice_quadro, None, False]
+
+            if not trilha[3] and self._evento(trilha[2], ponto, primeira_vez):
+                trilha[3] = True
+                self.totais[trilha[0]] += 1
+                self.contagem_janela[trilha[0]] += 1
+
+            trilha[1], trilha[2] = indice_quadro, ponto
+            self.ativos[id_rastreio] = trilha  # Volta para o fim: a ordem é a da última aparição
+
+        # As trilhas mais antigas ficam no começo, então o descarte para na primeira ainda ativa
+        while self.ativos:
+            id_rastreio, trilha = next(iter(self.ativos.items()))
+            if indice_quadro - trilha[1] <= self.max_inativo:
+                break
+            del self.ativos[id_rastreio]
+
+    def encerrar(self):
+        """Fecha a janela em andamento, grava o buffer do escritor e devolve os totais do vídeo."""
+        self._gravar_janela()
+        if self.escritor_janelas is not None:
+            self.escritor_janelas.descarregar()
+        return self.totais
+
+
+class EscritorContagens:
+    """
+    Grava as contagens por quadro à medida que o vídeo é processado.
+
+    As linhas ficam num buffer e são gravadas em blocos: em CSV, acrescentadas ao arquivo; em
+    Parquet, cada bloco vira um row group. A memória usada não cresce com a duração do vídeo e,
+    em CSV, tudo o que já foi gravado sobrevive a uma interrupção e permite retomar o trabalho.
+    """
+
+    def __init__(self, caminho, campos, tamanho_buffer=1000, retomar=False):
+        """
+        Args:
+            caminho (str): Arquivo de saída (.csv ou .parquet)
+            campos (list): Colunas, na ordem em que serão gravadas
+            tamanho_buffer (int): Número de linhas acumuladas antes de cada gravação
+            retomar (bool): Acrescenta a um CSV existente em vez de sobrescrevê-lo
+        """
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao not in (".csv", ".parquet"):
+            raise ValueError("O arquivo de contagens deve ter extensão .csv ou .parquet")
+        if retomar and extensao != ".csv":
+            raise ValueError("A retomada só é possível com saída em CSV")
+
+        self.caminho = caminho
+        self.campos = list(campos)
+        self.formato = extensao[1:]
+        self.tamanho_buffer = tamanho_buffer
+        self.buffer = []
+        self._arquivo = None
+        self._escritor = None
+
+        if self.formato == "csv":
+            existente = retomar and os.path.isfile(caminho) and os.path.getsize(caminho) > 0
+            if existente:
+                with open(caminho, newline="", encoding="utf-8") as arquivo:
+                    cabecalho = next(csv.reader(arquivo))
+                if cabecalho != self.campos:
+                    raise ValueError(f"As colunas de {caminho} não correspondem às da execução atual")
+            self._arquivo = open(caminho, "a" if existente else "w", newline="", encoding="utf-8")
+            self._escritor = csv.DictWriter(self._arquivo, fieldnames=self.campos, extrasaction="ignore")
+            if not existente:
+                self._escritor.writeheader()
+                self._arquivo.flush()
+
+    def escrever(self, linha):
+        """Acrescenta uma linha ao buffer, gravando o bloco quando ele enche."""
+        self.buffer.append(linha)
+        if len(self.buffer) >= self.tamanho_buffer:
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava as linhas do buffer no arquivo."""
+        if not self.buffer:
+            return
+        if self.formato == "csv":
+            self._escritor.writerows(self.buffer)
+            self._arquivo.flush()
+        else:
+            self._escrever_parquet()
+        self.buffer = []
+
+    def _escrever_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("A saída em Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+        colunas = {campo: [linha.get(campo) for linha in self.buffer] for campo in self.campos}
+        if self._escritor is None:
+            tabela = pa.table(colunas)
+            self._escritor = pq.ParquetWriter(self.caminho, tabela.schema)
+        else:
+            tabela = pa.table(colunas, schema=self._escritor.schema)
+        self._escritor.write_table(tabela)
+
+    def fechar(self):
+        """Grava o que restou no buffer e fecha o arquivo."""
+        try:
+            self.descarregar()
+        finally:
+            if self.formato == "csv" and self._arquivo is not None:
+                self._arquivo.close()
+            elif self.formato == "parquet" and self._escritor is not None:
+                self._escritor.close()
+            self._arquivo = None
+            self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def ultimo_quadro_gravado(caminho):
+    """
+    Retorna o índice do último quadro gravado num CSV de contagens, ou None se não houver nenhum.
+
+    Se a execução anterior foi interrompida no meio de uma linha, a linha incompleta é removida.
+    """
+    if not os.path.isfile(caminho) or os.path.getsize(caminho) == 0:
+        return None
+
+    with open(caminho, "rb+") as arquivo:
+        # Lê só o final do arquivo, o suficiente para achar as duas últimas quebras de linha
+        tamanho = arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(max(0, tamanho - 4096))
+        final = arquivo.read()
+        if not final.endswith(b"\n"):
+            corte = final.rfind(b"\n") + 1
+            arquivo.truncate(tamanho - len(final) + corte)
+            final = final[:corte]
+
+    linhas = final.splitlines()
+    if not linhas:
+        return None
+    try:
+        return int(linhas[-1].split(b",")[0])
+    except ValueError:
+        return None  # A última linha é o cabeçalho: nenhum quadro gravado
+
+
+def contar_deteccoes(deteccoes, classes_a_rastrear):
+    """Conta as detecções de um quadro por classe."""
+    contagens = {cls: 0 for cls in classes_a_rastrear}
+    for deteccao in deteccoes:
+        contagens[deteccao[0]] += 1
+    return contagens
+
+
+def desenhar_deteccoes(quadro, deteccoes):
+    """Desenha a caixa delimitadora e o rótulo de cada detecção no quadro."""
+    for nome_cls, x1, y1, x2, y2, _ in deteccoes:
+        cv2.rectangle(quadro, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(quadro, f"{nome_cls}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+
+class SaidaAnotada:
+    """
+    Destino dos quadros anotados: o vídeo de saída (completo ou uma prévia reduzida) e/ou
+    imagens dos quadros em que as contagens mudam.
+
+    Quadros que não vão para nenhum destino não são desenhados nem codificados.
+    """
+
+    def __init__(self, caminho_video, fps, tamanho_quadro, passo=1, escala=1.0, diretorio_quadros_chave=None):
+        """
+        Args:
+            caminho_video (str): Vídeo de saída, ou None para não gravar vídeo
+            fps (int): Taxa de quadros do vídeo de entrada
+            tamanho_quadro (tuple): (largura, altura) dos quadros de entrada
+            passo (int): Grava um a cada `passo` quadros no vídeo (1 grava todos)
+            escala (float): Fator de redução dos quadros gravados no vídeo
+            diretorio_quadros_chave (str): Pasta onde salvar os quadros em que as contagens mudam
+        """
+        self.passo = max(1, passo)
+        self.escala = escala
+        self.tamanho = (max(1, int(tamanho_quadro[0] * escala)), max(1, int(tamanho_quadro[1] * escala)))
+        self.diretorio_quadros_chave = diretorio_quadros_chave
+        self.video = None
+        if caminho_video is not None:
+            # A prévia mantém a duração do vídeo original
+            fps_saida = max(1, round(fps / self.passo)) if fps else 1
+            self.video = cv2.VideoWriter(caminho_video, cv2.VideoWriter_fourcc(*'mp4v'), fps_saida, self.tamanho)
+        if diretorio_quadros_chave is not None:
+            os.makedirs(diretorio_quadros_chave, exist_ok=True)
+
+    def gravar(self, indice_quadro, quadro, deteccoes, contagens_mudaram):
+        """Desenha e grava o quadro nos destinos que o pedem."""
+        no_video = self.video is not None and indice_quadro % self.passo == 0
+        quadro_chave = self.diretorio_quadros_chave is not None and contagens_mudaram
+        if not (no_video or quadro_chave):
+            return
+
+        desenhar_deteccoes(quadro, deteccoes)
+        if no_video:
+            if self.escala != 1.0:
+                self.video.write(cv2.resize(quadro, self.tamanho, interpolation=cv2.INTER_AREA))
+            else:
+                self.video.write(quadro)
+        if quadro_chave:
+            cv2.imwrite(os.path.join(self.diretorio_quadros_chave, f"quadro_{indice_quadro:07d}.jpg"), quadro)
+
+    def fechar(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+
+def _colocar(fila, item, parar):
+    """Coloca um item na fila sem travar para sempre caso o pipeline tenha sido interrompido."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _retirar(fila, parar):
+    """Retira o próximo item da fila; devolve FIM se o pipeline for interrompido."""
+    while not parar.is_set():
+        try:
+            return fila.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return FIM
+
+
+def _decodificar(cap, fila_quadros, ocupado, parar, erros):
+    """Etapa de decodificação: lê os quadros do vídeo e os coloca na fila, em ordem."""
+    try:
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            ret, quadro = cap.read()
+            ocupado["decodificacao"] += time.perf_counter() - inicio
+            if not ret:
+                break  # Fim do vídeo
+            if not _colocar(fila_quadros, quadro, parar):
+                break
+    except Exception as e:
+        erros.append(e)
+        parar.set()
+    finally:
+        _colocar(fila_quadros, FIM, parar)
+
+
+def _codificar(saida, fila_saida, ocupado, parar, erros):
+    """Etapa de anotação e codificação: desenha as detecções e escreve os quadros no vídeo de saída."""
+    try:
+        while True:
+            item = _retirar(fila_saida, parar)
+            if item is FIM:
+                break
+            inicio = time.perf_counter()
+            saida.gravar(*item)
+            ocupado["codificacao"] += time.perf_counter() - inicio
+    except Exception as e:
+        erros.append(e)
+        parar.set()
+
+
+def _processar_em_pipeline(cap, saida, inferir, contabilizar, tamanho_lote, tamanho_fila, ocupado):
+    """
+    Executa decodificação, inferência e codificação em paralelo, ligadas por filas limitadas.
+
+    A inferência fica na thread principal e consome os quadros na ordem em que foram lidos,
+    então o estado do rastreador evolui exatamente como no modo sequencial. Sem saída anotada
+    (saida None) a etapa de codificação nem é criada.
+    """
+    fila_quadros = queue.Queue(maxsize=max(tamanho_fila, tamanho_lote))
+    fila_saida = queue.Queue(maxsize=max(tamanho_fila, tamanho_lote))
+    parar = threading.Event()
+    erros = []
+
+    decodificador = threading.Thread(target=_decodificar, args=(cap, fila_quadros, ocupado, parar, erros))
+    decodificador.start()
+    codificador = None
+    if saida is not None:
+        codificador = threading.Thread(target=_codificar, args=(saida, fila_saida, ocupado, parar, erros))
+        codificador.start()
+
+    try:
+        fim = False
+        while not fim:
+            # Junta até tamanho_lote quadros (menos no fim do vídeo)
+            lote = []
+            while len(lote) < tamanho_lote:
+                quadro = _retirar(fila_quadros, parar)
+                if quadro is FIM:
+                    fim = True
+                    break
+                lote.append(quadro)
+            if not lote:
+                break
+
+            inicio = time.perf_counter()
+            deteccoes_lote = inferir(lote)
+            ocupado["inferencia"] += time.perf_counter() - inicio
+
+            for quadro, (deteccoes, inferido) in zip(lote, deteccoes_lote):
+                indice_quadro, mudou = contabilizar(deteccoes, inferido)
+                if codificador is not None and not _colocar(fila_saida, (indice_quadro, quadro, deteccoes, mudou),
+                                                            parar):
+                    fim = True
+                    break
+    except Exception:
+        parar.set()
+        raise
+    finally:
+        # O codificador termina de escrever os quadros já enfileirados antes do FIM;
+        # se algo falhou, o evento parar libera todas as threads
+        if codificador is not None:
+            _colocar(fila_saida, FIM, parar)
+            codificador.join()
+        parar.set()
+        decodificador.join()
+
+    if erros:
+        raise erros[0]
+
+
+def _ler_lote(cap, tamanho_lote, ocupado):
+    """Lê até tamanho_lote quadros do vídeo; a lista vem vazia no fim do vídeo."""
+    lote = []
+    inicio = time.perf_counter()
+    while len(lote) < tamanho_lote:
+        ret, quadro = cap.read()
+        if not ret:
+            break
+        lote.append(quadro)
+    ocupado["decodificacao"] += time.perf_counter() - inicio
+    return lote
+
+
+def com_sufixo(caminho, sufixo):
+    """Acrescenta um sufixo ao nome de um arquivo ou pasta, antes da extensão."""
+    if caminho is None:
+        return None
+    base, extensao = os.path.splitext(caminho)
+    return f"{base}{sufixo}{extensao}"
+
+
+def processar_video(caminho_video, modelo, caminho_saida, classes_a_rastrear, pipeline=False, tamanho_fila=8,
+                    metricas=None, tamanho_lote=1, rastreador="botsort.yaml", filtro_movimento=None,
+                    contador=None, caminho_contagens=CAMINHO_CONTAGENS, retomar=False, tamanho_buffer=1000,
+                    rois=None, tamanho_inferencia=None, passo_previa=1, escala_previa=1.0,
+                    diretorio_quadros_chave=None):
     """
     Processa um vídeo, detecta e conta objetos das classes especificadas.
-    
+
     Args:
         caminho_video (str): Caminho para o arquivo de vídeo de entrada
         modelo (YOLO): Modelo YOLO para detecção de objetos
-        caminho_saida (str): Caminho para salvar o vídeo processado
+        caminho_saida (str): Caminho para salvar o vídeo processado; None para só contar, sem
+            desenhar nem codificar vídeo
         classes_a_rastrear (list): Lista de classes de objetos a serem rastreadas
-        
+        pipeline (bool): Sobrepõe leitura, inferência e escrita do vídeo em threads separadas
+        tamanho_fila (int): Número máximo de quadros em espera entre duas etapas do pipeline
+        metricas (dict): Se fornecido, recebe o número de quadros, o FPS e a utilização de cada etapa
+        tamanho_lote (int): Número de quadros detectados numa única chamada ao modelo
+        rastreador (str): Configuração do rastreador usada com lotes maiores que 1
+        filtro_movimento (FiltroDeMovimento): Se fornecido, só roda o modelo nos quadros com movimento;
+            o CSV ganha a coluna "inferido"
+        contador (ContadorUnico): Se fornecido, conta veículos únicos pelos ids de rastreamento
+        caminho_contagens (str): Arquivo .csv ou .parquet das contagens por quadro
+        retomar (bool): Continua a partir do último quadro já gravado em caminho_contagens (CSV). O
+            vídeo da nova execução vai para outro arquivo (<saida>_a_partir_<quadro>), sem apagar
+            o trecho já gravado. O estado do contador de únicos (trilhas ativas e janela em
+            andamento) não é gravado, então a retomada não é aceita com contador
+        tamanho_buffer (int): Linhas acumuladas antes de cada gravação das contagens
+        rois (list): Regiões de interesse (x, y, largura, altura); só elas são enviadas ao modelo
+        tamanho_inferencia (int): Lado da imagem de entrada do modelo (padrão do modelo se None)
+        passo_previa (int): Grava no vídeo de saída só um a cada passo_previa quadros
+        escala_previa (float): Fator de redução dos quadros do vídeo de saída
+        diretorio_quadros_chave (str): Se fornecido, salva ali os quadros anotados em que as contagens mudam
+
     Returns:
-        dict: Dicionário com a contagem total de objetos por classe
+        dict: Dicionário com a contagem total de objetos por classe (soma das caixas de todos os
+            quadros, ou veículos únicos quando um contador é fornecido)
     """
-    
+
+    if retomar and contador is not None:
+        print("Erro: a contagem de veículos únicos não pode ser retomada; processe o vídeo do início")
+        return None
+
     # Abre o vídeo de entrada
     cap = cv2.VideoCapture(caminho_video)
     if not cap.isOpened():
@@ -29,77 +810,231 @@ def processar_video(caminho_video, modelo, caminho_saida, classes_a_rastrear):
     largura_quadro = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     altura_quadro = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = int(cap.get(cv2.CAP_PROP_FPS))
-    
-    # Configura o vídeo de saída
-    saida = cv2.VideoWriter(caminho_saida, cv2.VideoWriter_fourcc(*'mp4v'), fps, (largura_quadro, altura_quadro))
+    if rois:
+        try:
+            rois = ajustar_rois(rois, largura_quadro, altura_quadro)
+        except ValueError as e:
+            cap.release()
+            print(f"Erro: {e}")
+            return None
 
     # Inicializa contadores
     contagem_objetos = {cls: 0 for cls in classes_a_rastrear}  # Contagem total
-    contagens_quadro = []  # Armazena contagens por quadro
+    quadros_processados = 0
 
-    # Processa cada quadro do vídeo
-    while cap.isOpened():
-        ret, quadro = cap.read()
-        if not ret:
-            break  # Sai do loop quando o vídeo terminar
-
-        # Executa a detecção e rastreamento de objetos
-        resultados = modelo.track(quadro, persist=True)
-        
-        # Inicializa contador para o quadro atual
-        contagens_quadro_atual = {cls: 0 for cls in classes_a_rastrear}
-
-        # Processa cada detecção no quadro
-        for resultado in resultados:
-            for caixa in resultado.boxes:
-                nome_cls = modelo.names[int(caixa.cls)]  # Obtém o nome da classe
-                
-                # Verifica se a classe está na lista de classes a rastrear
-                if nome_cls in classes_a_rastrear:
-                    contagens_quadro_atual[nome_cls] += 1
-
-                    # Desenha a caixa delimitadora e o rótulo
-                    x1, y1, x2, y2 = map(int, caixa.xyxy[0])
-                    cv2.rectangle(quadro, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(quadro, f"{nome_cls}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-        # Atualiza contagens totais
+    # Ao retomar, pula os quadros já gravados e parte dos totais que eles somam
+    primeiro_quadro = 0
+    if retomar:
+        ultimo = ultimo_quadro_gravado(caminho_contagens)
+        if ultimo is not None:
+            primeiro_quadro = ultimo + 1
+            cap.set(cv2.CAP_PROP_POS_FRAMES, primeiro_quadro)
+            for bloco in pd.read_csv(caminho_contagens, usecols=classes_a_rastrear, chunksize=100000):
+                for cls in classes_a_rastrear:
+                    contagem_objetos[cls] += int(bloco[cls].sum())
+            print(f"Retomando a partir do quadro {primeiro_quadro}")
+
+    # Configura o vídeo de saída; no modo só de contagens nada é desenhado nem codificado. Na
+    # retomada o trecho novo vai para outro arquivo, porque o VideoWriter não acrescenta a um
+    # vídeo existente; os quadros-chave já levam o índice no nome e não colidem
+    saida = None
+    if caminho_saida is not None or diretorio_quadros_chave is not None:
+        if caminho_saida is not None and primeiro_quadro > 0:
+            caminho_saida = com_sufixo(caminho_saida, f"_a_partir_{primeiro_quadro}")
+            print(f"Vídeo do trecho retomado: {caminho_saida}")
+        saida = SaidaAnotada(caminho_saida, fps, (largura_quadro, altura_quadro), passo_previa, escala_previa,
+                             diretorio_quadros_chave)
+
+    # As contagens por quadro são gravadas em blocos, sem acumular o vídeo inteiro em memória
+    campos = ["quadro", "tempo_s"] + list(classes_a_rastrear) + (["inferido"] if filtro_movimento is not None else [])
+    escritor = EscritorContagens(caminho_contagens, campos, tamanho_buffer, retomar)
+
+    # Tempo efetivamente gasto em cada etapa (sem contar a espera nas filas)
+    ocupado = {"decodificacao": 0.0, "inferencia": 0.0, "codificacao": 0.0}
+    inicio_total = time.perf_counter()
+
+    inferir = criar_inferencia(modelo, classes_a_rastrear, tamanho_lote, rastreador, rois, tamanho_inferencia,
+                               (largura_quadro, altura_quadro))
+    if filtro_movimento is not None:
+        inferir = aplicar_filtro_de_movimento(inferir, filtro_movimento)
+    quadros_inferidos = 0
+    contagens_anteriores = None
+
+    def contabilizar(deteccoes, inferido):
+        nonlocal quadros_inferidos, quadros_processados, contagens_anteriores
+        indice_quadro = primeiro_quadro + quadros_processados
+        tempo_s = indice_quadro / fps if fps else 0.0
+
+        # Atualiza contagens do quadro e totais
+        contagens_quadro_atual = contar_deteccoes(deteccoes, classes_a_rastrear)
         for cls in classes_a_rastrear:
             contagem_objetos[cls] += contagens_quadro_atual[cls]
+        if contador is not None:
+            contador.atualizar(indice_quadro, tempo_s, deteccoes)
 
-        # Armazena contagens do quadro e escreve no vídeo de saída
-        contagens_quadro.append(contagens_quadro_atual)
-        saida.write(quadro)
+        linha = {"quadro": indice_quadro, "tempo_s": round(tempo_s, 3), **contagens_quadro_atual}
+        if filtro_movimento is not None:
+            linha["inferido"] = int(inferido)
+        escritor.escrever(linha)
+        quadros_inferidos += inferido
+        quadros_processados += 1
 
-    # Libera recursos
-    cap.release()
-    saida.release()
+        mudou = contagens_quadro_atual != contagens_anteriores
+        contagens_anteriores = contagens_quadro_atual
+        return indice_quadro, mudou
 
-    # Salva contagens por quadro em arquivo CSV
-    df = pd.DataFrame(contagens_quadro)
-    df.to_csv("contagem_objetos_por_quadro.csv", index=False)
+    try:
+        if pipeline:
+            _processar_em_pipeline(cap, saida, inferir, contabilizar, tamanho_lote, tamanho_fila, ocupado)
+        else:
+            # Processa o vídeo em lotes de quadros (um quadro por vez com tamanho_lote 1)
+            while cap.isOpened():
+                lote = _ler_lote(cap, tamanho_lote, ocupado)
+                if not lote:
+                    break  # Sai do loop quando o vídeo terminar
 
+                # Executa a detecção e rastreamento de objetos
+                inicio = time.perf_counter()
+                deteccoes_lote = inferir(lote)
+                ocupado["inferencia"] += time.perf_counter() - inicio
+
+                for quadro, (deteccoes, inferido) in zip(lote, deteccoes_lote):
+                    indice_quadro, mudou = contabilizar(deteccoes, inferido)
+
+                    # Desenha as detecções e escreve no vídeo de saída
+                    if saida is not None:
+                        inicio = time.perf_counter()
+                        saida.gravar(indice_quadro, quadro, deteccoes, mudou)
+                        ocupado["codificacao"] += time.perf_counter() - inicio
+    finally:
+        # Libera recursos; as contagens restantes no buffer são gravadas mesmo se houver erro
+        cap.release()
+        if saida is not None:
+            saida.fechar()
+        escritor.fechar()
+
+    duracao = time.perf_counter() - inicio_total
+    if metricas is not None:
+        metricas["quadros"] = quadros_processados
+        metricas["quadros_inferidos"] = quadros_inferidos
+        metricas["tempo_total_s"] = duracao
+        metricas["fps"] = quadros_processados / duracao if duracao > 0 else 0.0
+        # Fração do tempo total em que cada etapa esteve trabalhando; no modo
+        # sequencial as frações somam ~1, no pipeline a maior indica o gargalo
+        metricas["utilizacao"] = {etapa: tempo / duracao if duracao > 0 else 0.0
+                                  for etapa, tempo in ocupado.items()}
+
+    if contador is not None:
+        contador.encerrar()
+        return dict(contador.totais)
     return contagem_objetos
 
 def principal():
     """
     Função principal que configura e executa o processamento do vídeo.
     """
-    # Carrega o modelo YOLO pré-treinado
-    modelo = YOLO('yolov8n.pt')
-    
     # Configura caminhos e parâmetros
-    caminho_video = r'D:\dowloads\exemplo.mp4'  # Substitua pelo caminho do seu vídeo
-    caminho_saida = 'output_detected.mp4'  # Nome do arquivo de saída
-    classes_a_rastrear = ['car', 'truck', 'bus', 'van']  # Classes de veículos a detectar
-
-    # Processa o vídeo e obtém contagens
-    contagens = processar_video(caminho_video, modelo, caminho_saida, classes_a_rastrear)
-    
-    # Exibe resultados
-    print("\nContagem total de objetos no vídeo:")
-    for cls, contagem in contagens.items():
-        print(f"{cls}: {contagem}")
+    parser = argparse.ArgumentParser(description="Detecção e contagem de veículos em vídeo com YOLO.")
+    parser.add_argument("video", nargs="?", default=r'D:\dowloads\exemplo.mp4',
+                        help="caminho do vídeo de entrada")  # Substitua pelo caminho do seu vídeo
+    parser.add_argument("-o", "--saida", default='output_detected.mp4', help="vídeo de saída com as detecções")
+    parser.add_argument("--somente-contagens", action="store_true",
+                        help="não desenha nem grava o vídeo de saída, só as contagens")
+    parser.add_argument("--previa", type=int, default=1, metavar="N",
+                        help="grava no vídeo de saída só um a cada N quadros")
+    parser.add_argument("--escala-previa", type=float, default=1.0, help="fator de redução do vídeo de saída")
+    parser.add_argument("--quadros-chave", default=None, metavar="PASTA",
+                        help="salva os quadros anotados em que as contagens mudam")
+    parser.add_argument("--modelo", default='yolov8n.pt', help="pesos do modelo YOLO")
+    parser.add_argument("--classes", nargs="+", default=['car', 'truck', 'bus', 'van'],
+                        help="classes de veículos a detectar")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="sobrepõe leitura, inferência e escrita do vídeo em threads")
+    parser.add_argument("--fila", type=int, default=8, help="tamanho das filas entre as etapas do pipeline")
+    parser.add_argument("--lote", type=int, nargs="+", default=[1],
+                        help="quadros por chamada ao modelo; com vários valores, mede a vazão de cada um e "
+                             "grava contagens, vídeo e quadros-chave com o sufixo _loteN")
+    parser.add_argument("--rastreador", default="botsort.yaml", help="configuração do rastreador para lotes > 1")
+    parser.add_argument("--movimento", type=float, default=None,
+                        help="fração de pixels alterados abaixo da qual o quadro reaproveita as detecções anteriores")
+    parser.add_argument("--max-pulados", type=int, default=15,
+                        help="máximo de quadros seguidos sem inferência com --movimento")
+    parser.add_argument("--roi", type=int, nargs=4, action="append", metavar=("X", "Y", "LARGURA", "ALTURA"),
+                        help="região de interesse enviada ao modelo (pode ser repetida)")
+    parser.add_argument("--imgsz", type=int, default=None, help="tamanho da imagem de entrada do modelo")
+    parser.add_argument("--contagens", default=CAMINHO_CONTAGENS,
+                        help="arquivo .csv ou .parquet das contagens por quadro")
+    parser.add_argument("--retomar", action="store_true",
+                        help="continua a partir do último quadro gravado no CSV de contagens; o vídeo "
+                             "anotado do trecho novo vai para <saida>_a_partir_<quadro>")
+    parser.add_argument("--unicos", action="store_true", help="conta veículos únicos pelos ids de rastreamento")
+    parser.add_argument("--linha", type=int, nargs=4, metavar=("X1", "Y1", "X2", "Y2"), default=None,
+                        help="com --unicos, conta só os veículos que cruzam esta linha")
+    parser.add_argument("--zona", type=int, nargs="+", default=None,
+                        help="com --unicos, conta só os veículos que entram no polígono x1 y1 x2 y2 ...")
+    parser.add_argument("--janela", type=float, default=60.0, help="janela de tempo do relatório de únicos (s)")
+    parser.add_argument("--janelas", default=CAMINHO_JANELAS,
+                        help="arquivo .csv ou .parquet dos veículos únicos por janela")
+    args = parser.parse_args()
+
+    # Com vários tamanhos de lote cada execução grava seus próprios arquivos (sufixo _loteN);
+    # retomar não faz sentido numa medição de vazão, que precisa processar o vídeo inteiro
+    varios_lotes = len(args.lote) > 1
+    if varios_lotes and args.retomar:
+        parser.error("--retomar não pode ser usado com mais de um valor em --lote")
+    if args.unicos and args.retomar:
+        parser.error("--retomar não pode ser usado com --unicos: o estado do rastreamento não é gravado")
+
+    vazoes = {}
+    for tamanho_lote in args.lote:
+        sufixo = f"_lote{tamanho_lote}" if varios_lotes else ""
+
+        # Carrega o modelo YOLO pré-treinado (um por execução, para não herdar trilhas da anterior)
+        modelo = YOLO(args.modelo)
+
+        # Processa o vídeo e obtém contagens
+        metricas = {}
+        filtro = FiltroDeMovimento(args.movimento, args.max_pulados) if args.movimento is not None else None
+        contador = escritor_janelas = None
+        if args.unicos:
+            linha = (tuple(args.linha[:2]), tuple(args.linha[2:])) if args.linha else None
+            zona = list(zip(args.zona[::2], args.zona[1::2])) if args.zona else None
+            escritor_janelas = EscritorContagens(com_sufixo(args.janelas, sufixo), ["inicio_s"] + args.classes)
+            contador = ContadorUnico(args.classes, linha, zona, args.janela, escritor_janelas=escritor_janelas)
+        caminho_saida = None if args.somente_contagens else com_sufixo(args.saida, sufixo)
+        try:
+            contagens = processar_video(args.video, modelo, caminho_saida, args.classes, args.pipeline, args.fila,
+                                        metricas, tamanho_lote, args.rastreador, filtro, contador,
+                                        com_sufixo(args.contagens, sufixo), args.retomar, rois=args.roi,
+                                        tamanho_inferencia=args.imgsz, passo_previa=args.previa,
+                                        escala_previa=args.escala_previa,
+                                        diretorio_quadros_chave=com_sufixo(args.quadros_chave, sufixo))
+        finally:
+            if escritor_janelas is not None:
+                escritor_janelas.fechar()
+        if contagens is None:
+            return
+
+        # Exibe resultados
+        tipo = "veículos únicos" if contador is not None else "objetos"
+        print(f"\nContagem total de {tipo} no vídeo (lote de {tamanho_lote}):")
+        for cls, contagem in contagens.items():
+            print(f"{cls}: {contagem}")
+        if contador is not None:
+            print(f"\n{contador.janelas_encerradas} janelas de {args.janela:g} s gravadas em: "
+                  f"{os.path.abspath(escritor_janelas.caminho)}")
+
+        print(f"\n{metricas['quadros']} quadros em {metricas['tempo_total_s']:.1f} s ({metricas['fps']:.1f} FPS)")
+        if filtro is not None:
+            print(f"Quadros inferidos: {metricas['quadros_inferidos']} de {metricas['quadros']}")
+        for etapa, fracao in metricas["utilizacao"].items():
+            print(f"Utilização da {etapa}: {fracao:.0%}")
+        vazoes[tamanho_lote] = metricas["fps"]
+
+    if len(vazoes) > 1:
+        print("\nVazão por tamanho de lote:")
+        for tamanho_lote, fps in vazoes.items():
+            print(f"lote {tamanho_lote}: {fps:.1f} FPS ({fps / vazoes[args.lote[0]]:.2f}x)")
 
 # Ponto de entrada do programa
 if __name__ == "__main__":
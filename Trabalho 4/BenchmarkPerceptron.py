@@ -0,0 +1,110 @@
+import sys
+import time
+
+import numpy as np
+
+from perceptron import NOMES_BOOLEANAS, Perceptron, funcoes_booleanas
+
+
+def treinar_laco(dados_entrada, saidas_esperadas, pesos, vies, taxa_aprendizado, max_epocas):
+    # Reprodução do laço antigo do trabalho04.py: listas Python, np.dot e np.array por amostra
+    pesos, vies = pesos.copy(), vies.copy()
+    for epoca in range(max_epocas):
+        erros = 0
+        for i in range(len(dados_entrada)):
+            soma_ponderada = np.dot(dados_entrada[i], pesos) + vies
+            saida_predita = 1 if soma_ponderada >= 0 else 0
+            if saida_predita == saidas_esperadas[i]:
+                continue
+            erros += 1
+            if saida_predita == 0:
+                pesos += taxa_aprendizado * np.array(dados_entrada[i])
+                vies += taxa_aprendizado * 1
+            else:
+                pesos -= taxa_aprendizado * np.array(dados_entrada[i])
+                vies -= taxa_aprendizado * 1
+        if erros == 0:
+            return pesos, vies, epoca + 1
+    return pesos, vies, max_epocas
+
+
+def gerar_dados(amostras, entradas, semente=0, ruido=0.05):
+    # Classes separadas por um hiperplano aleatório, com uma fração de rótulos trocados
+    # para que o treino rode todas as épocas e a vazão seja comparável
+    rng = np.random.default_rng(semente)
+    dados = rng.integers(-10, 11, (amostras, entradas))
+    normal, deslocamento = rng.normal(size=entradas), rng.normal()
+    saidas = (dados @ normal + deslocamento >= 0).astype(np.int64)
+    trocadas = rng.random(amostras) < ruido
+    saidas[trocadas] = 1 - saidas[trocadas]
+    return dados, saidas
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+
+def comparar_modos(amostras, entradas=2, max_epocas=5, tamanho_lote=256):
+    dados, saidas = gerar_dados(amostras, entradas)
+    rng = np.random.default_rng(42)
+    pesos, vies = rng.random(entradas), rng.random(1)
+
+    (pesos_laco, vies_laco, epocas), tempo = cronometrar(
+        lambda: treinar_laco(dados.tolist(), saidas.tolist(), pesos, vies, 0.1, max_epocas))
+    print(f"{amostras} amostras, {entradas} entradas, {epocas} épocas")
+    print(f"  laço antigo: {amostras * epocas / tempo:12.0f} amostras/s")
+
+    for modo in ("online", "minilote", "lote"):
+        perceptron = Perceptron(entradas, pesos=pesos, vies=vies)
+        _, tempo = cronometrar(lambda: perceptron.treinar(dados, saidas, max_epocas, modo, tamanho_lote))
+        vazao = amostras * perceptron.epocas[0] / tempo
+        extra = ""
+        if modo == "online":
+            identico = np.array_equal(perceptron.pesos[0], pesos_laco) and np.array_equal(perceptron.vies, vies_laco)
+            extra = f" (pesos idênticos ao laço: {identico})"
+        print(f"  {modo:>11}: {vazao:12.0f} amostras/s, erros finais {perceptron.erros(dados, saidas)[0]}{extra}")
+
+
+def comparar_varios_modelos(amostras, modelos, entradas=2, max_epocas=5, tamanho_lote=256):
+    # Muitas sementes: um perceptron por vez contra todos numa matriz de pesos
+    dados, saidas = gerar_dados(amostras, entradas)
+    iniciais = np.random.default_rng(7).random((modelos, entradas + 1))
+
+    def um_por_vez():
+        for pesos in iniciais:
+            Perceptron(entradas, pesos=pesos[:-1], vies=pesos[-1:]).treinar(
+                dados, saidas, max_epocas, "minilote", tamanho_lote)
+
+    _, tempo_separados = cronometrar(um_por_vez)
+    conjunto = Perceptron(entradas, modelos, pesos=iniciais[:, :-1], vies=iniciais[:, -1])
+    _, tempo_conjunto = cronometrar(lambda: conjunto.treinar(dados, saidas, max_epocas, "minilote", tamanho_lote))
+    total = amostras * max_epocas * modelos
+    print(f"{modelos} modelos x {amostras} amostras (minilote): "
+          f"separados {total / tempo_separados:.0f}, matriz {total / tempo_conjunto:.0f} amostras-modelo/s")
+
+
+def treinar_booleanas(max_epocas=20):
+    entradas, saidas = funcoes_booleanas()
+    perceptron = Perceptron(2, 16, semente=42)
+    perceptron.treinar(entradas, saidas, max_epocas)
+    for k in range(16):
+        nome = NOMES_BOOLEANAS.get(k, "")
+        tabela = "".join(map(str, saidas[:, k]))
+        situacao = f"convergiu em {perceptron.epocas[k]} épocas" if perceptron.convergiu[k] else "não convergiu"
+        print(f"  função {k:2d} {tabela} {nome:>10}: {situacao}")
+
+
+def main():
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for amostras in (1_000, 10_000, 100_000, 1_000_000):
+        if amostras <= maximo:
+            comparar_modos(amostras)
+    comparar_varios_modelos(min(maximo, 10_000), 256)
+    print("16 funções booleanas de duas entradas (online):")
+    treinar_booleanas()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+
+MODOS = ("online", "lote", "minilote")
+JANELA_MINIMA = 8
+JANELA_MAXIMA = 4096
+
+# Tabela-verdade das 16 funções booleanas de duas entradas: a coluna k tem o bit i
+# de k como saída esperada para a linha i de ENTRADAS_BOOLEANAS
+ENTRADAS_BOOLEANAS = np.array([[0, 0],
+                               [0, 1],
+                               [1, 0],
+                               [1, 1]])
+NOMES_BOOLEANAS = {0: "FALSO", 1: "NOR", 6: "XOR", 7: "NAND", 8: "AND", 9: "XNOR", 14: "OR", 15: "VERDADEIRO"}
+
+
+def funcoes_booleanas():
+    saidas = (np.arange(16)[None, :] >> np.arange(4)[:, None]) & 1
+    return ENTRADAS_BOOLEANAS.copy(), saidas
+
+
+def ativacao(somas):
+    return (somas >= 0).astype(np.int64)
+
+
+class Perceptron:
+    # num_modelos perceptrons independentes, guardados como uma matriz de pesos
+    # (num_modelos, num_entradas) e um vetor de vieses, treinados juntos
+
+    def __init__(self, num_entradas, num_modelos=1, taxa_aprendizado=0.1, semente=None, pesos=None, vies=None):
+        rng = np.random.default_rng(semente)
+        if pesos is None:
+            pesos = rng.random((num_modelos, num_entradas))
+        if vies is None:
+            vies = rng.random(num_modelos)
+
+        self.pesos = np.array(pesos, dtype=np.float64).reshape(num_modelos, num_entradas)
+        self.vies = np.array(vies, dtype=np.float64).reshape(num_modelos)
+        self.taxa_aprendizado = taxa_aprendizado
+        self.epocas = None
+        self.convergiu = None
+
+    @property
+    def num_modelos(self):
+        return self.pesos.shape[0]
+
+    def somas(self, entradas):
+        return np.asarray(entradas, dtype=np.float64) @ self.pesos.T + self.vies
+
+    def prever(self, entradas):
+        # (amostras, modelos)
+        return ativacao(self.somas(entradas))
+
+    def erros(self, entradas, saidas):
+        # Amostras classificadas errado por modelo, calculadas sobre o conjunto inteiro
+        return np.count_nonzero(self.prever(entradas) != self._alvos(saidas), axis=0)
+
+    def _alvos(self, saidas):
+        # Aceita um alvo comum a todos os modelos (amostras,) ou um por modelo (amostras, modelos)
+        saidas = np.asarray(saidas, dtype=np.int64)
+        if saidas.ndim == 1:
+            saidas = np.broadcast_to(saidas[:, None], (saidas.shape[0], self.num_modelos))
+        if saidas.shape[1] != self.num_modelos:
+            raise ValueError(f"Esperadas saídas para {self.num_modelos} modelos, recebidas {saidas.shape[1]}")
+        return saidas
+
+    def _epoca_online(self, entradas, alvos):
+        # Regra do perceptron amostra a amostra: pesos += taxa * (esperado - predito) * entrada.
+        # Entre duas correções os pesos não mudam, então as predições de uma janela de
+        # amostras seguintes saem de uma só multiplicação; a janela recomeça logo depois
+        # da primeira amostra errada e cresce enquanto não aparecem erros
+        erros = np.zeros(self.num_modelos, dtype=np.int64)
+        inicio, janela = 0, JANELA_MINIMA
+        while inicio < entradas.shape[0]:
+            fim = min(inicio + janela, entradas.shape[0])
+            diferencas = alvos[inicio:fim] - ativacao(entradas[inicio:fim] @ self.pesos.T + self.vies)
+            erradas = np.flatnonzero(diferencas.any(axis=1))
+            if not len(erradas):
+                inicio, janela = fim, min(2 * janela, JANELA_MAXIMA)
+                continue
+
+            posicao = erradas[0]
+            diferenca = diferencas[posicao]
+            erros += diferenca != 0
+            passo = self.taxa_aprendizado * diferenca
+            self.pesos += passo[:, None] * entradas[inicio + posicao]
+            self.vies += passo
+            inicio, janela = inicio + posicao + 1, max(JANELA_MINIMA, 2 * (posicao + 1))
+        return erros
+
+    def _epoca_lote(self, entradas, alvos, tamanho_lote):
+        erros = np.zeros(self.num_modelos, dtype=np.int64)
+        for inicio in range(0, entradas.shape[0], tamanho_lote):
+            lote = entradas[inicio:inicio + tamanho_lote]
+            diferencas = alvos[inicio:inicio + tamanho_lote] - ativacao(lote @ self.pesos.T + self.vies)
+            erros += np.count_nonzero(diferencas, axis=0)
+            self.pesos += self.taxa_aprendizado * (diferencas.T @ lote)
+            self.vies += self.taxa_aprendizado * diferencas.sum(axis=0)
+        return erros
+
+    def treinar(self, entradas, saidas, max_epocas=10, modo="online", tamanho_lote=32):
+        # modo "online" reproduz exatamente a regra amostra a amostra; "lote" soma as
+        # correções de todas as amostras numa só atualização por época e "minilote"
+        # atualiza a cada tamanho_lote amostras. Para quando nenhum modelo erra numa época.
+        if modo not in MODOS:
+            raise ValueError(f"Modo deve ser um de {MODOS}")
+
+        entradas = np.asarray(entradas, dtype=np.float64)
+        alvos = self._alvos(saidas)
+        if modo == "lote":
+            tamanho_lote = entradas.shape[0]
+
+        self.epocas = np.full(self.num_modelos, max_epocas, dtype=np.int64)
+        self.convergiu = np.zeros(self.num_modelos, dtype=bool)
+
+        for epoca in range(max_epocas):
+            if modo == "online":
+                erros = self._epoca_online(entradas, alvos)
+            else:
+                erros = self._epoca_lote(entradas, alvos, tamanho_lote)
+
+            # Uma época sem erros não altera os pesos, então o modelo já está parado
+            novos = (erros == 0) & ~self.convergiu
+            self.epocas[novos] = epoca + 1
+            self.convergiu |= novos
+            if self.convergiu.all():
+                break
+        return self.convergiu
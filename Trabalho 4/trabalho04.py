@@ -1,5 +1,7 @@
 import numpy as np
 
+from perceptron import Perceptron
+
 dados_entrada = [[0, 0],
                  [0, 1],
                  [1, 0],
@@ -11,39 +13,18 @@ pesos = np.random.rand(2)
 vies = np.random.rand(1)
 taxa_aprendizado = 0.1
 
-def funcao_ativacao(soma):
-    return 1 if soma >= 0 else 0
-
 max_epocas = 10
-convergiu = False
-
-for epoca in range(max_epocas):
-    erros = 0
-
-    for i in range(len(dados_entrada)):
-        soma_ponderada = np.dot(dados_entrada[i], pesos) + vies
-        saida_predita = funcao_ativacao(soma_ponderada)
-
-        if saida_predita == saidas_esperadas[i]:
-            continue
 
-        erros += 1
-        if saida_predita == 0:
-            pesos += taxa_aprendizado * np.array(dados_entrada[i])
-            vies += taxa_aprendizado * 1
-        else:
-            pesos -= taxa_aprendizado * np.array(dados_entrada[i])
-            vies -= taxa_aprendizado * 1
+perceptron = Perceptron(2, taxa_aprendizado=taxa_aprendizado, pesos=pesos, vies=vies)
+convergiu = bool(perceptron.treinar(dados_entrada, saidas_esperadas, max_epocas)[0])
 
-    if erros == 0:
-        convergiu = True
-        break
+pesos = perceptron.pesos[0]
+vies = perceptron.vies
 
 print("Pesos finais:", pesos)
 print("Viés final:", vies)
 
 print("\nTeste final:")
+saidas = perceptron.prever(dados_entrada)[:, 0]
 for i in range(len(dados_entrada)):
-    soma = np.dot(dados_entrada[i], pesos) + vies
-    saida = funcao_ativacao(soma)
-    print(f"Entrada: {dados_entrada[i]} → Saída: {saida} (Esperado: {saidas_esperadas[i]})")
+    print(f"Entrada: {dados_entrada[i]} → Saída: {saidas[i]} (Esperado: {saidas_esperadas[i]})")
@@ -18,8 +18,126 @@ def binarizar_imagem(imagem):
     return imagem_binarizada
 
 
-def aplicar_filtro_morfologico(imagem, kernel_size):
-    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+ELEMENTOS = ("quadrado", "disco", "linha_horizontal", "linha_vertical")
+BACKENDS = ("opencv", "bits", "van_herk")
+
+
+def criar_elemento(forma, tamanho):
+    if forma == "quadrado":
+        return np.ones((tamanho, tamanho), np.uint8)
+    if forma == "disco":
+        return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (tamanho, tamanho))
+    if forma == "linha_horizontal":
+        return np.ones((1, tamanho), np.uint8)
+    if forma == "linha_vertical":
+        return np.ones((tamanho, 1), np.uint8)
+    raise ValueError(f"Elemento estruturante desconhecido: {forma}")
+
+
+def minmax_corrido(imagem, tamanho, eixo, operacao):
+    # van Herk/Gil-Werman: o eixo é dividido em blocos de `tamanho`; com o
+    # acumulado de cada bloco para a frente e para trás, toda janela é a
+    # combinação de um sufixo e um prefixo, então o custo por pixel é fixo
+    if tamanho == 1:
+        return imagem
+    # Fora da imagem vale o elemento neutro, como a borda padrão do OpenCV
+    neutro = 255 if operacao is np.minimum else 0
+    n = imagem.shape[eixo]
+    antes = tamanho // 2
+    depois = tamanho - 1 - antes
+    total = -(-(n + tamanho - 1) // tamanho) * tamanho
+
+    imagem = np.moveaxis(imagem, eixo, 0)
+    estendida = np.full((total,) + imagem.shape[1:], neutro, dtype=imagem.dtype)
+    estendida[antes:antes + n] = imagem
+
+    # O eixo filtrado fica por fora; cada passo do acumulado é uma operação
+    # vetorial sobre linhas inteiras de todos os blocos ao mesmo tempo
+    prefixo = estendida.reshape((total // tamanho, tamanho) + imagem.shape[1:])
+    sufixo = prefixo.copy()
+    for posicao in range(1, tamanho):
+        operacao(prefixo[:, posicao - 1], prefixo[:, posicao], out=prefixo[:, posicao])
+        operacao(sufixo[:, -posicao], sufixo[:, -posicao - 1], out=sufixo[:, -posicao - 1])
+    prefixo = prefixo.reshape(estendida.shape)
+    sufixo = sufixo.reshape(estendida.shape)
+
+    resultado = operacao(sufixo[:n], prefixo[tamanho - 1:tamanho - 1 + n])
+    return np.ascontiguousarray(np.moveaxis(resultado, 0, eixo))
+
+
+def _alargar(filtrada, largura, nova_largura, operacao):
+    # Janela centrada de `largura` -> `nova_largura` (até o dobro) com uma
+    # única operação entre duas cópias deslocadas da linha já filtrada
+    antes = nova_largura // 2 - largura // 2
+    depois = (nova_largura - 1 - nova_largura // 2) - (largura - 1 - largura // 2)
+    colunas = filtrada.shape[1] - antes - depois
+    resultado = filtrada.copy()
+    operacao(filtrada[:, :colunas], filtrada[:, antes + depois:], out=resultado[:, antes:antes + colunas])
+    return resultado
+
+
+def _filtrar_disco(imagem, elemento, operacao):
+    # O disco é a união de segmentos horizontais centrados: as larguras são
+    # obtidas em ordem crescente, cada uma a partir da anterior, e as linhas
+    # são combinadas com deslocamento vertical. O custo cresce com o número de
+    # linhas do elemento, não com a sua área
+    neutro = 255 if operacao is np.minimum else 0
+    altura, largura_imagem = imagem.shape[:2]
+    margem = elemento.shape[1]
+
+    # Com a margem neutra, os valores filtrados perto da borda continuam corretos
+    filtrada = np.full((altura, largura_imagem + 2 * margem), neutro, dtype=imagem.dtype)
+    filtrada[:, margem:margem + largura_imagem] = imagem
+    atual = 1
+    por_largura = {}
+    for largura in sorted(set(np.count_nonzero(elemento, axis=1).tolist()) - {0}):
+        while atual < largura:
+            nova = min(largura, 2 * atual)
+            filtrada = _alargar(filtrada, atual, nova, operacao)
+            atual = nova
+        por_largura[largura] = filtrada[:, margem:margem + largura_imagem]
+
+    centro = elemento.shape[0] // 2
+    estendida = np.full((altura + elemento.shape[0] - 1, largura_imagem), neutro, dtype=imagem.dtype)
+    resultado = None
+    for linha in range(elemento.shape[0]):
+        largura = int(np.count_nonzero(elemento[linha]))
+        if largura == 0:
+            continue
+        estendida[centro:centro + altura] = por_largura[largura]
+        deslocada = estendida[linha:linha + altura]
+        resultado = deslocada.copy() if resultado is None else operacao(resultado, deslocada, out=resultado)
+    return resultado
+
+
+def _filtrar_van_herk(imagem, forma, kernel_size, operacao):
+    if forma == "disco":
+        return _filtrar_disco(imagem, criar_elemento(forma, kernel_size), operacao)
+    if forma in ("quadrado", "linha_horizontal"):
+        imagem = minmax_corrido(imagem, kernel_size, 1, operacao)
+    if forma in ("quadrado", "linha_vertical"):
+        imagem = minmax_corrido(imagem, kernel_size, 0, operacao)
+    return imagem
+
+
+def aplicar_filtro_morfologico(imagem, kernel_size, backend="opencv", elemento="quadrado"):
+    if elemento not in ELEMENTOS:
+        raise ValueError(f"Elemento deve ser um de: {', '.join(ELEMENTOS)}")
+    if backend not in BACKENDS:
+        raise ValueError(f"backend deve ser um de: {', '.join(BACKENDS)}")
+
+    kernel = criar_elemento(elemento, kernel_size)
+    if backend == "bits":
+        # Só para imagens binárias (0/255): a abertura é feita com 1 bit por pixel, e a
+        # imagem vai direto para as palavras e volta delas sem cópias intermediárias
+        from MorfologiaBits import desempacotar, dilatar_empacotado, empacotar, erodir_empacotado
+        estrutura = kernel.astype(bool)
+        palavras, largura = empacotar(imagem)
+        palavras = dilatar_empacotado(erodir_empacotado(palavras, largura, estrutura), largura, estrutura)
+        return desempacotar(palavras, largura, 255)
+    if backend == "van_herk":
+        erodida = _filtrar_van_herk(imagem, elemento, kernel_size, np.minimum)
+        return _filtrar_van_herk(erodida, elemento, kernel_size, np.maximum)
     return cv2.morphologyEx(imagem, cv2.MORPH_OPEN, kernel)
 
 
@@ -30,31 +148,45 @@ def salvar_imagem(imagem, caminho_saida):
         raise IOError(f"Erro ao salvar a imagem em: {caminho_saida}")
 
 
-def solicitar_kernel_size():
+def solicitar_kernel_size(maximo=51):
     while True:
-        entrada = input("Digite o tamanho do kernel (1 a 5): ").strip()
+        entrada = input(f"Digite o tamanho do kernel (1 a {maximo}): ").strip()
         try:
             valor = int(entrada)
-            if 1 <= valor <= 5:
+            if 1 <= valor <= maximo:
                 return valor
             else:
-                print("Por favor, insira um número entre 1 e 5.")
+                print(f"Por favor, insira um número entre 1 e {maximo}.")
         except ValueError:
-            print("Entrada inválida. Digite um número inteiro entre 1 e 5.")
+            print(f"Entrada inválida. Digite um número inteiro entre 1 e {maximo}.")
+
+
+def solicitar_elemento():
+    while True:
+        entrada = input(f"Elemento estruturante ({', '.join(ELEMENTOS)}) [quadrado]: ").strip().lower()
+        if not entrada:
+            return "quadrado"
+        if entrada in ELEMENTOS:
+            return entrada
+        print(f"Elemento inválido. Escolha entre: {', '.join(ELEMENTOS)}.")
 
 
 def main():
     caminho_entrada = input("Caminho da imagem de entrada: ").strip('" ')
     caminho_saida = input("Caminho para salvar a imagem filtrada: ").strip('" ')
     kernel_size = solicitar_kernel_size()
+    elemento = solicitar_elemento()
+    # O OpenCV já separa quadrados e linhas; no disco o custo dele cresce com k²
+    # e a decomposição em linhas passa a compensar (ver BenchmarkAbertura.py)
+    backend = "van_herk" if elemento == "disco" and kernel_size > 25 else "opencv"
 
     try:
         imagem = carregar_imagem_em_cinza(caminho_entrada)
         imagem_binaria = binarizar_imagem(imagem)
-        imagem_filtrada = aplicar_filtro_morfologico(imagem_binaria, kernel_size)
+        imagem_filtrada = aplicar_filtro_morfologico(imagem_binaria, kernel_size, backend, elemento)
         salvar_imagem(imagem_filtrada, caminho_saida)
 
-        print(f"Imagem filtrada salva com sucesso em: {caminho_saida} (Kernel = {kernel_size}x{kernel_size})")
+        print(f"Imagem filtrada salva com sucesso em: {caminho_saida} (Kernel = {elemento} {kernel_size}x{kernel_size})")
     except Exception as e:
         print(f"Erro: {e}")
 
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+from functools import lru_cache
 
 
 def carregar_imagem(caminho):
@@ -43,6 +44,116 @@ def aplicar_mascaras(imagem, mascaras):
     return resultado
 
 
+def rotular_mascara(imagem_binaria):
+    if len(imagem_binaria.shape) == 3:
+        imagem_binaria = cv2.cvtColor(imagem_binaria, cv2.COLOR_BGR2GRAY)
+
+    _, mascara_binaria = cv2.threshold(imagem_binaria, 127, 255, cv2.THRESH_BINARY)
+    contornos, _ = cv2.findContours(mascara_binaria, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Os contornos externos preenchidos não se sobrepõem, então desenhá-los todos
+    # numa única máscara equivale à união das máscaras de processar_imagem_binaria
+    mascara = np.zeros_like(imagem_binaria)
+    cv2.drawContours(mascara, contornos, -1, 255, -1)
+
+    num_rotulos, rotulos, estatisticas, centroides = cv2.connectedComponentsWithStats(mascara, connectivity=8)
+    return mascara, num_rotulos, rotulos, estatisticas, centroides
+
+
+@lru_cache(maxsize=None)
+def tabelas_de_realce():
+    # Com saturação e brilho fixos em 255, a cor realçada depende só da matiz
+    # (0-179). O OpenCV converte HSV->BGR por um caminho vetorizado e, no fim de
+    # cada linha, por um caminho escalar que às vezes arredonda diferente; as
+    # duas tabelas guardam o resultado de cada caminho
+    hsv = np.full((1, 180 * 64, 3), 255, dtype=np.uint8)
+    hsv[0, :, 0] = np.tile(np.arange(180, dtype=np.uint8), 64)
+    vetorial = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, :180]
+    escalar = cv2.cvtColor(hsv[0, :180].reshape(-1, 1, 3), cv2.COLOR_HSV2BGR)[:, 0]
+    return vetorial, escalar
+
+
+@lru_cache(maxsize=None)
+def colunas_escalares(largura):
+    # Descobre quais colunas de uma linha com essa largura caem no caminho escalar
+    vetorial, escalar = tabelas_de_realce()
+    distintas = np.flatnonzero((vetorial != escalar).any(axis=1))
+    if len(distintas) == 0:
+        return np.zeros(largura, dtype=bool)
+
+    matizes = distintas[np.arange(largura) % len(distintas)].astype(np.uint8)
+    hsv = np.full((1, largura, 3), 255, dtype=np.uint8)
+    hsv[0, :, 0] = matizes
+    convertida = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0]
+    return (convertida == escalar[matizes]).all(axis=1)
+
+
+def aplicar_realce(imagem, mascara):
+    # Mesmo realce de aplicar_mascaras (saturação e brilho no máximo, somado com
+    # peso 0.7), calculado uma única vez e só sobre os pixels marcados
+    resultado = imagem.copy()
+    linhas, colunas = np.nonzero(mascara)
+    if len(linhas) == 0:
+        return resultado
+
+    pixels = imagem[linhas, colunas].reshape(-1, 1, 3)
+    matizes = cv2.cvtColor(pixels, cv2.COLOR_BGR2HSV)[:, 0, 0]
+
+    vetorial, escalar = tabelas_de_realce()
+    no_escalar = colunas_escalares(imagem.shape[1])[colunas]
+    realce = np.where(no_escalar[:, np.newaxis], escalar[matizes], vetorial[matizes]).reshape(-1, 1, 3)
+
+    resultado[linhas, colunas] = cv2.addWeighted(pixels, 1, realce, 0.7, 0)[:, 0]
+    return resultado
+
+
+def realcar_regioes(imagem, imagem_binaria):
+    rotulacao = rotular_mascara(imagem_binaria)
+    return aplicar_realce(imagem, rotulacao[0]), rotulacao
+
+
+def estatisticas_regioes(rotulacao, imagem_antes, imagem_depois, cena=""):
+    # Tudo sai da rotulação já calculada: área, caixa e centroide vêm do
+    # connectedComponentsWithStats e as cores médias de um bincount por canal
+    _, num_rotulos, rotulos, estatisticas, centroides = rotulacao
+    rotulos_planos = rotulos.ravel()
+    areas = estatisticas[:, cv2.CC_STAT_AREA]
+
+    medias = {}
+    for momento, imagem in (("antes", imagem_antes), ("depois", imagem_depois)):
+        for canal, cor in enumerate("bgr"):
+            somas = np.bincount(rotulos_planos, weights=imagem[..., canal].ravel(), minlength=num_rotulos)
+            medias[f"media_{momento}_{cor}"] = somas / np.maximum(areas, 1)
+
+    regioes = []
+    for rotulo in range(1, num_rotulos):
+        regiao = {
+            "cena": cena,
+            "regiao": rotulo,
+            "area_px": int(areas[rotulo]),
+            "x": int(estatisticas[rotulo, cv2.CC_STAT_LEFT]),
+            "y": int(estatisticas[rotulo, cv2.CC_STAT_TOP]),
+            "largura": int(estatisticas[rotulo, cv2.CC_STAT_WIDTH]),
+            "altura": int(estatisticas[rotulo, cv2.CC_STAT_HEIGHT]),
+            "centroide_x": round(float(centroides[rotulo, 0]), 2),
+            "centroide_y": round(float(centroides[rotulo, 1]), 2),
+        }
+        for coluna, valores in medias.items():
+            regiao[coluna] = round(float(valores[rotulo]), 2)
+        regioes.append(regiao)
+
+    area_total = int(areas[1:].sum())
+    totais = {
+        "cena": cena,
+        "regioes": num_rotulos - 1,
+        "area_total_px": area_total,
+        "fracao_alterada": round(area_total / rotulos.size, 6),
+        "largura": rotulos.shape[1],
+        "altura": rotulos.shape[0],
+    }
+    return regioes, totais
+
+
 def gerar_caminho_saida(caminho_entrada, sufixo="_mask", extensao=".png"):
     base = os.path.splitext(os.path.basename(caminho_entrada))[0]
     pasta = os.path.dirname(caminho_entrada) or "."
@@ -63,8 +174,7 @@ def main():
         imagem_binaria = carregar_imagem(caminho_binaria)
         imagem_base = carregar_imagem(caminho_base)
 
-        mascaras = processar_imagem_binaria(imagem_binaria)
-        imagem_resultante = aplicar_mascaras(imagem_base, mascaras)
+        imagem_resultante, _ = realcar_regioes(imagem_base, imagem_binaria)
 
         caminho_saida = gerar_caminho_saida(caminho_base)
         salvar_imagem(imagem_resultante, caminho_saida)
@@ -0,0 +1,42 @@
+import sys
+
+import numpy as np
+
+from Abertura import BACKENDS, aplicar_filtro_morfologico
+from BenchmarkMeanShift import cronometrar
+
+TAMANHOS = (3, 5, 9, 15, 25, 35, 51)
+
+
+def gerar_mascara(lado, semente=0):
+    rng = np.random.default_rng(semente)
+    return (rng.random((lado, lado)) < 0.6).astype(np.uint8) * 255
+
+
+def medir_elemento(mascara, elemento, tamanhos=TAMANHOS):
+    megapixels = mascara.size / 1e6
+    print(f"\n{elemento} ({mascara.shape[1]}x{mascara.shape[0]}), ms/MP:")
+    print("k".rjust(4) + "".join(backend.rjust(12) for backend in BACKENDS))
+
+    for k in tamanhos:
+        tempos = []
+        referencia = None
+        for backend in BACKENDS:
+            tempo, resultado = cronometrar(lambda: aplicar_filtro_morfologico(mascara, k, backend, elemento))
+            if referencia is None:
+                referencia = resultado
+            elif not np.array_equal(referencia, resultado):
+                raise AssertionError(f"{backend} diverge do OpenCV para {elemento} k={k}")
+            tempos.append(tempo * 1000 / megapixels)
+        print(f"{k:4d}" + "".join(f"{tempo:12.1f}" for tempo in tempos))
+
+
+def principal():
+    lado = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    mascara = gerar_mascara(lado)
+    for elemento in ("quadrado", "disco", "linha_horizontal"):
+        medir_elemento(mascara, elemento)
+
+
+if __name__ == "__main__":
+    principal()
@@ -0,0 +1,80 @@
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from MeanShift import (to_data, make_shifted_img, para_dados_vetorizado, montar_imagem_segmentada,
+                       redimensionar_imagem, segmentar_array_mean_shift)
+
+
+def cronometrar(funcao, repeticoes=3):
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def caminho_original(img, rotulos, centros):
+    dados = tuple(to_data(img))
+    return dados, make_shifted_img(img.shape[:2], rotulos, centros)
+
+
+def caminho_vetorizado(img, rotulos, centros):
+    dados = para_dados_vetorizado(img)
+    return dados, montar_imagem_segmentada(img.shape[:2], rotulos, centros)
+
+
+def medir_conversao(lado, num_clusters=4, semente=0):
+    rng = np.random.default_rng(semente)
+    img = rng.integers(0, 256, (lado, lado, 3), dtype=np.uint8)
+    rotulos = rng.integers(0, num_clusters, lado * lado)
+    centros = rng.uniform(0, 255, (num_clusters, 3))
+
+    t_original, (dados_o, saida_o) = cronometrar(lambda: caminho_original(img, rotulos, centros), repeticoes=1)
+    t_vetorizado, (dados_v, saida_v) = cronometrar(lambda: caminho_vetorizado(img, rotulos, centros))
+
+    if not np.array_equal(np.asarray(dados_o), dados_v) or not np.array_equal(saida_o, saida_v):
+        raise AssertionError(f"Resultados divergentes para {lado}x{lado}")
+
+    megapixels = lado * lado / 1e6
+    print(f"{lado}x{lado}: original {t_original / megapixels:.3f} s/MP, "
+          f"vetorizado {t_vetorizado / megapixels:.4f} s/MP, "
+          f"ganho {t_original / t_vetorizado:.0f}x")
+
+
+def medir_segmentacao(caminho_imagem, quantil=0.1, amostras=500):
+    array_img = redimensionar_imagem(np.array(Image.open(caminho_imagem).convert('RGB')))
+    megapixels = array_img.shape[0] * array_img.shape[1] / 1e6
+
+    t_original, (saida_o, _) = cronometrar(
+        lambda: segmentar_array_mean_shift(array_img, quantil, amostras, motor="original"), repeticoes=1)
+    t_vetorizado, (saida_v, _) = cronometrar(
+        lambda: segmentar_array_mean_shift(array_img, quantil, amostras, motor="vetorizado"), repeticoes=1)
+
+    print(f"{caminho_imagem}: original {t_original / megapixels:.2f} s/MP, "
+          f"vetorizado {t_vetorizado / megapixels:.2f} s/MP, "
+          f"idênticas: {np.array_equal(saida_o, saida_v)}")
+
+    # O motor por histograma dispensa o limite de 1 MP e processa a imagem em resolução total
+    array_total = np.array(Image.open(caminho_imagem).convert('RGB'))
+    megapixels_total = array_total.shape[0] * array_total.shape[1] / 1e6
+    t_histograma, _ = cronometrar(
+        lambda: segmentar_array_mean_shift(array_total, quantil, amostras, motor="histograma"), repeticoes=1)
+    print(f"{caminho_imagem}: histograma {t_histograma / megapixels_total:.2f} s/MP "
+          f"({megapixels_total:.2f} MP em resolução total)")
+
+
+def principal():
+    for lado in (256, 512, 1024):
+        medir_conversao(lado)
+
+    for caminho_imagem in sys.argv[1:]:
+        medir_segmentacao(caminho_imagem)
+
+
+if __name__ == "__main__":
+    principal()
@@ -2,6 +2,8 @@ import cv2
 import os
 import numpy as np
 
+from Estatisticas import calcular_estatisticas
+
 
 def carregar_imagem_em_cinza(caminho):
     imagem = cv2.imread(caminho, cv2.IMREAD_GRAYSCALE)
@@ -14,6 +16,11 @@ def calcular_limiar_automatico(imagem):
     return np.mean(imagem)
 
 
+def calcular_limiar_em_blocos(blocos, metodo="media", percentil=50):
+    # Um único limiar para a cena inteira, acumulado bloco a bloco
+    return calcular_estatisticas(blocos).limiar(metodo, percentil)
+
+
 def binarizar_imagem(imagem, limiar):
     _, binarizada = cv2.threshold(imagem, limiar, 255, cv2.THRESH_BINARY)
     return binarizada
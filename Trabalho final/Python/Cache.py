@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+TAMANHO_MAXIMO_PADRAO = 1024 * 2 ** 20
+
+
+def impressao_digital(array):
+    # Identifica a imagem pelo conteúdo, não pelo caminho: a mesma cena copiada ou
+    # renomeada reaproveita os resultados
+    array = np.ascontiguousarray(array)
+    resumo = hashlib.sha256(f"{array.dtype.str}|{array.shape}".encode())
+    resumo.update(array.data)
+    return resumo.hexdigest()
+
+
+class CacheResultados:
+    # Cada resultado é um .npz com nome derivado de (impressão da entrada, etapa,
+    # parâmetros). A escrita vai para um temporário na mesma pasta e é publicada
+    # com os.replace, então processos concorrentes nunca leem um arquivo pela
+    # metade. A data de modificação marca o último uso e guia a remoção LRU.
+
+    def __init__(self, diretorio, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.faltas = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def caminho(self, etapa, impressao, parametros):
+        descricao = json.dumps({"etapa": etapa, "entrada": impressao, "parametros": parametros}, sort_keys=True)
+        return os.path.join(self.diretorio, f"{etapa}-{hashlib.sha256(descricao.encode()).hexdigest()}.npz")
+
+    def obter(self, etapa, impressao, parametros):
+        caminho = self.caminho(etapa, impressao, parametros)
+        try:
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                valores = {nome: arquivo[nome] for nome in arquivo.files}
+        except FileNotFoundError:
+            self.faltas += 1
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Arquivo ilegível (por exemplo, de uma versão antiga do numpy): recalcula
+            self._remover(caminho)
+            self.faltas += 1
+            return None
+
+        try:
+            os.utime(caminho)
+        except FileNotFoundError:
+            pass
+        self.acertos += 1
+        return valores
+
+    def guardar(self, etapa, impressao, parametros, valores):
+        caminho = self.caminho(etapa, impressao, parametros)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(descritor, "wb") as arquivo:
+                np.savez(arquivo, **valores)
+            os.replace(temporario, caminho)
+        except BaseException:
+            self._remover(temporario)
+            raise
+        self.limitar()
+
+    def calcular(self, etapa, impressao, parametros, funcao):
+        # funcao() devolve um dicionário nome -> array (ou escalar)
+        valores = self.obter(etapa, impressao, parametros)
+        if valores is None:
+            valores = funcao()
+            self.guardar(etapa, impressao, parametros, valores)
+            valores = {nome: np.asarray(valor) for nome, valor in valores.items()}
+        return valores
+
+    def limitar(self):
+        # Remove os resultados usados há mais tempo até caber no tamanho máximo;
+        # outro processo pode ter removido o mesmo arquivo no meio do caminho
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".npz"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime_ns, info.st_size, nome))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, nome in sorted(entradas):
+            if total <= self.tamanho_maximo:
+                break
+            self._remover(os.path.join(self.diretorio, nome))
+            total -= tamanho
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,187 @@
+import argparse
+import os
+import time
+
+import cv2
+
+from MeanShift import estimar_largura_banda, preparar_dados, redimensionar_imagem, segmentar_array_mean_shift
+from Binarizar import calcular_limiar_automatico, binarizar_imagem
+from Subtrair import carregar_imagem, redimensionar_para_compatibilidade, subtrair_imagens, salvar_imagem
+from Abertura import aplicar_filtro_morfologico
+from AplicarMascara import realcar_regioes, estatisticas_regioes
+from Tabelas import EscritorTabela, caminho_tabela_cenas
+from Cache import TAMANHO_MAXIMO_PADRAO, CacheResultados, impressao_digital
+
+
+def segmentar_com_cache(rgb, quantil, amostras, motor, cache):
+    # Mean Shift e limiar guardados por conteúdo da imagem e parâmetros; a largura de
+    # banda tem entrada própria porque os motores original e vetorizado usam a mesma
+    # estimativa do sklearn e podem compartilhá-la
+    impressao = impressao_digital(rgb)
+    parametros = {"quantil": quantil, "amostras": amostras, "motor": motor}
+
+    def segmentar():
+        # Pixels ou histograma preparados uma só vez, para a largura de banda e o Mean Shift
+        dados = preparar_dados(rgb, motor)
+        estimador = "histograma" if motor == "histograma" else "sklearn"
+        largura_banda = cache.calcular(
+            "largura_banda", impressao, {"quantil": quantil, "amostras": amostras, "estimador": estimador},
+            lambda: {"largura_banda": estimar_largura_banda(rgb, quantil, amostras, motor, dados=dados)}
+        )["largura_banda"]
+        segmentada, num_clusters = segmentar_array_mean_shift(rgb, quantil, amostras, motor, float(largura_banda),
+                                                              dados=dados)
+        return {"segmentada": segmentada, "num_clusters": num_clusters}
+
+    segmentada = cache.calcular("mean_shift", impressao, parametros, segmentar)["segmentada"]
+
+    def limiar():
+        return {"limiar": calcular_limiar_automatico(cv2.cvtColor(segmentada, cv2.COLOR_RGB2GRAY))}
+
+    return segmentada, float(cache.calcular("limiar", impressao, dict(parametros, metodo="media"), limiar)["limiar"])
+
+
+def segmentar_e_binarizar(imagem, quantil=0.1, amostras=500, motor="vetorizado", cache=None):
+    rgb = cv2.cvtColor(imagem, cv2.COLOR_BGR2RGB)
+    if motor != "histograma":
+        rgb = redimensionar_imagem(rgb)
+
+    if cache is None:
+        segmentada, _ = segmentar_array_mean_shift(rgb, quantil, amostras, motor)
+        cinza = cv2.cvtColor(segmentada, cv2.COLOR_RGB2GRAY)
+        limiar = calcular_limiar_automatico(cinza)
+    else:
+        segmentada, limiar = segmentar_com_cache(rgb, quantil, amostras, motor, cache)
+        cinza = cv2.cvtColor(segmentada, cv2.COLOR_RGB2GRAY)
+    binarizada = binarizar_imagem(cinza, limiar)
+
+    # A segmentação pode ter sido feita numa versão reduzida da imagem
+    altura, largura = imagem.shape[:2]
+    if binarizada.shape != (altura, largura):
+        binarizada = cv2.resize(binarizada, (largura, altura), interpolation=cv2.INTER_NEAREST)
+
+    return cv2.cvtColor(segmentada, cv2.COLOR_RGB2BGR), binarizada
+
+
+def detectar_mudancas(imagem_antes, imagem_depois, quantil=0.1, amostras=500, kernel_size=3, motor="vetorizado",
+                      cena="", cache=None):
+    tempos = {}
+
+    inicio = time.perf_counter()
+    imagem_depois = redimensionar_para_compatibilidade(imagem_antes, imagem_depois)
+    segmentada_antes, binaria_antes = segmentar_e_binarizar(imagem_antes, quantil, amostras, motor, cache)
+    segmentada_depois, binaria_depois = segmentar_e_binarizar(imagem_depois, quantil, amostras, motor, cache)
+    tempos["segmentacao"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    diferenca = subtrair_imagens(binaria_antes, binaria_depois)
+    tempos["subtracao"] = time.perf_counter() - inicio
+
+    # A diferença de duas imagens binárias já é binária; a rebinarização
+    # feita pelo Abertura.py ao ler o arquivo do disco não é necessária aqui
+    inicio = time.perf_counter()
+    filtrada = aplicar_filtro_morfologico(diferenca, kernel_size)
+    tempos["abertura"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    realcada, rotulacao = realcar_regioes(imagem_depois, filtrada)
+    regioes, totais = estatisticas_regioes(rotulacao, imagem_antes, imagem_depois, cena)
+    tempos["mascaras"] = time.perf_counter() - inicio
+
+    return {
+        "segmentada_antes": segmentada_antes,
+        "segmentada_depois": segmentada_depois,
+        "binaria_antes": binaria_antes,
+        "binaria_depois": binaria_depois,
+        "diferenca": diferenca,
+        "filtrada": filtrada,
+        "realcada": realcada,
+        "rotulacao": rotulacao,
+        "regioes": regioes,
+        "totais": totais,
+        "tempos": tempos,
+    }
+
+
+def salvar_resultados(resultados, diretorio_saida, nome_antes, nome_depois, salvar_intermediarios=False):
+    os.makedirs(diretorio_saida, exist_ok=True)
+    nome_par = f"{nome_antes}_{nome_depois}"
+
+    arquivos = {
+        f"{nome_par}_resultado.png": resultados["filtrada"],
+        f"{nome_par}_mask.png": resultados["realcada"],
+    }
+    if salvar_intermediarios:
+        arquivos.update({
+            f"{nome_antes}_mean_shift.png": resultados["segmentada_antes"],
+            f"{nome_depois}_mean_shift.png": resultados["segmentada_depois"],
+            f"{nome_antes}_bin.png": resultados["binaria_antes"],
+            f"{nome_depois}_bin.png": resultados["binaria_depois"],
+            f"{nome_depois}_sub.png": resultados["diferenca"],
+        })
+
+    caminhos = []
+    for nome_arquivo, imagem in arquivos.items():
+        caminho = os.path.join(diretorio_saida, nome_arquivo)
+        salvar_imagem(imagem, caminho)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def detectar_mudancas_arquivos(caminho_antes, caminho_depois, diretorio_saida=None, salvar_intermediarios=False,
+                               quantil=0.1, amostras=500, kernel_size=3, motor="vetorizado", cache=None):
+    imagem_antes = carregar_imagem(caminho_antes)
+    imagem_depois = carregar_imagem(caminho_depois)
+    nome_antes = os.path.splitext(os.path.basename(caminho_antes))[0]
+    nome_depois = os.path.splitext(os.path.basename(caminho_depois))[0]
+
+    resultados = detectar_mudancas(imagem_antes, imagem_depois, quantil, amostras, kernel_size, motor,
+                                   cena=f"{nome_antes}_{nome_depois}", cache=cache)
+
+    if diretorio_saida is not None:
+        salvar_resultados(resultados, diretorio_saida, nome_antes, nome_depois, salvar_intermediarios)
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecção de mudanças na cobertura vegetal entre duas imagens.")
+    parser.add_argument("antes", help="caminho da imagem 'antes'")
+    parser.add_argument("depois", help="caminho da imagem 'depois'")
+    parser.add_argument("-o", "--saida", default=".", help="diretório onde salvar os resultados")
+    parser.add_argument("--intermediarios", action="store_true", help="salva também as imagens de cada etapa")
+    parser.add_argument("--quantil", type=float, default=0.1, help="quantil do Mean Shift (0.01-0.2)")
+    parser.add_argument("--amostras", type=int, default=500, help="amostras para estimar a largura de banda")
+    parser.add_argument("--kernel", type=int, default=3, help="tamanho do kernel da abertura")
+    parser.add_argument("--motor", choices=("original", "vetorizado", "histograma"), default="vetorizado",
+                        help="implementação do Mean Shift")
+    parser.add_argument("--regioes", default=None,
+                        help="tabela .csv ou .parquet onde acrescentar as estatísticas de cada região")
+    parser.add_argument("--cache", default=None,
+                        help="diretório para guardar Mean Shift, largura de banda e limiares entre execuções")
+    parser.add_argument("--cache-max", type=float, default=TAMANHO_MAXIMO_PADRAO / 2 ** 20,
+                        help="tamanho máximo do cache em MiB")
+    args = parser.parse_args()
+
+    cache = CacheResultados(args.cache, int(args.cache_max * 2 ** 20)) if args.cache else None
+    try:
+        resultados = detectar_mudancas_arquivos(args.antes, args.depois, args.saida, args.intermediarios,
+                                                args.quantil, args.amostras, args.kernel, args.motor, cache)
+    except Exception as e:
+        print(f"Erro: {e}")
+        return
+
+    if args.regioes:
+        with EscritorTabela(args.regioes) as tabela:
+            tabela.escrever(resultados["regioes"])
+        with EscritorTabela(caminho_tabela_cenas(args.regioes)) as tabela:
+            tabela.escrever([resultados["totais"]])
+
+    for etapa, duracao in resultados["tempos"].items():
+        print(f"{etapa}: {duracao:.2f} s")
+    totais = resultados["totais"]
+    print(f"Regiões alteradas: {totais['regioes']} ({totais['area_total_px']} pixels)")
+    print(f"Resultados salvos em: {os.path.abspath(args.saida)}")
+
+
+if __name__ == "__main__":
+    main()
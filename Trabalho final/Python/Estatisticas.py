@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+METODOS_LIMIAR = ("media", "otsu", "percentil")
+
+
+class EstatisticasIntensidade:
+    def __init__(self, histograma=None):
+        self.histograma = np.zeros(256, dtype=np.int64) if histograma is None else np.asarray(histograma, np.int64)
+
+    def atualizar(self, bloco):
+        bloco = np.asarray(bloco)
+        if bloco.dtype != np.uint8:
+            raise ValueError(f"As estatísticas esperam blocos uint8, recebido {bloco.dtype}")
+        self.histograma += np.bincount(bloco.ravel(), minlength=256)
+        return self
+
+    def combinar(self, outra):
+        self.histograma += outra.histograma
+        return self
+
+    @property
+    def total(self):
+        return int(self.histograma.sum())
+
+    @property
+    def media(self):
+        if self.total == 0:
+            raise ValueError("Nenhum pixel foi acumulado")
+        # Soma inteira exata, sem o erro de arredondamento de somar floats bloco a bloco
+        return int(self.histograma @ np.arange(256, dtype=np.int64)) / self.total
+
+    def limiar_otsu(self):
+        # Mesmo critério do cv2.THRESH_OTSU: maximiza a variância entre classes,
+        # com a classe escura formada pelos valores <= limiar
+        probabilidades = self.histograma / self.total
+        niveis = np.arange(256)
+        peso_escuro = np.cumsum(probabilidades)
+        momento_escuro = np.cumsum(probabilidades * niveis)
+        peso_claro = 1.0 - peso_escuro
+        media_total = momento_escuro[-1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media_escura = momento_escuro / peso_escuro
+            media_clara = (media_total - momento_escuro) / peso_claro
+            variancia = peso_escuro * peso_claro * (media_escura - media_clara) ** 2
+        variancia[~np.isfinite(variancia)] = 0.0
+        return float(np.argmax(variancia))
+
+    def limiar_percentil(self, percentil):
+        if not 0 <= percentil <= 100:
+            raise ValueError("O percentil deve estar entre 0 e 100")
+        acumulado = np.cumsum(self.histograma)
+        return float(np.searchsorted(acumulado, percentil / 100 * self.total))
+
+    def limiar(self, metodo="media", percentil=50):
+        if metodo == "media":
+            return self.media
+        if metodo == "otsu":
+            return self.limiar_otsu()
+        if metodo == "percentil":
+            return self.limiar_percentil(percentil)
+        raise ValueError(f"Método de limiar desconhecido: {metodo}")
+
+    def salvar(self, caminho):
+        pasta = os.path.dirname(caminho) or "."
+        os.makedirs(pasta, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            json.dump({"histograma": self.histograma.tolist()}, arquivo)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, encoding="utf-8") as arquivo:
+            return cls(json.load(arquivo)["histograma"])
+
+
+def calcular_estatisticas(blocos):
+    estatisticas = EstatisticasIntensidade()
+    for bloco in blocos:
+        estatisticas.atualizar(bloco)
+    return estatisticas
+
+
+def caminho_cache_estatisticas(caminho, variante, diretorio_cache=None):
+    caminho = os.path.abspath(caminho)
+    info = os.stat(caminho)
+    chave = hashlib.sha256(f"{caminho}|{info.st_size}|{info.st_mtime_ns}|{variante}".encode()).hexdigest()
+    diretorio_cache = diretorio_cache or os.path.join(os.path.dirname(caminho), ".estatisticas")
+    return os.path.join(diretorio_cache, f"{chave}.json")
+
+
+def estatisticas_de_arquivo(caminho, calcular, variante="cinza", diretorio_cache=None):
+    # O arquivo é identificado por caminho, tamanho e data de modificação; se
+    # algum deles mudar, a passada de estatísticas é refeita
+    caminho_cache = caminho_cache_estatisticas(caminho, variante, diretorio_cache)
+    if os.path.isfile(caminho_cache):
+        return EstatisticasIntensidade.carregar(caminho_cache)
+
+    estatisticas = calcular()
+    estatisticas.salvar(caminho_cache)
+    return estatisticas
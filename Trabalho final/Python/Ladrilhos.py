@@ -0,0 +1,169 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from Binarizar import binarizar_imagem
+from Abertura import aplicar_filtro_morfologico
+from Estatisticas import METODOS_LIMIAR, EstatisticasIntensidade, estatisticas_de_arquivo
+
+
+def abrir_raster(caminho):
+    if not os.path.isfile(caminho):
+        raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
+
+    # Arquivos .npy são mapeados em memória e lidos só na janela pedida;
+    # outros formatos precisam ser decodificados inteiros pelo OpenCV
+    if caminho.lower().endswith(".npy"):
+        return np.load(caminho, mmap_mode="r")
+
+    imagem = cv2.imread(caminho, cv2.IMREAD_UNCHANGED)
+    if imagem is None:
+        raise ValueError(f"Não foi possível carregar a imagem: {caminho}")
+    return imagem
+
+
+def ler_cinza(raster, y0, y1, x0, x1):
+    bloco = np.ascontiguousarray(raster[y0:y1, x0:x1])
+    if bloco.ndim == 3:
+        bloco = cv2.cvtColor(bloco, cv2.COLOR_BGRA2GRAY if bloco.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    return bloco
+
+
+def gerar_janelas(altura, largura, tamanho_ladrilho):
+    for y0 in range(0, altura, tamanho_ladrilho):
+        for x0 in range(0, largura, tamanho_ladrilho):
+            yield y0, min(y0 + tamanho_ladrilho, altura), x0, min(x0 + tamanho_ladrilho, largura)
+
+
+def gerar_faixas(altura, linhas_por_faixa):
+    for y0 in range(0, altura, linhas_por_faixa):
+        yield y0, min(y0 + linhas_por_faixa, altura)
+
+
+def estatisticas_em_faixas(raster, linhas_por_faixa=256, trabalhadores=None):
+    # Cada faixa gera um histograma parcial; os parciais são somados no final
+    altura, largura = raster.shape[:2]
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        parciais = executor.map(
+            lambda faixa: EstatisticasIntensidade().atualizar(ler_cinza(raster, faixa[0], faixa[1], 0, largura)),
+            gerar_faixas(altura, linhas_por_faixa))
+        estatisticas = EstatisticasIntensidade()
+        for parcial in parciais:
+            estatisticas.combinar(parcial)
+    return estatisticas
+
+
+def estatisticas_diferenca_em_faixas(antes, depois, limiar_antes, limiar_depois, linhas_por_faixa=256,
+                                     trabalhadores=None):
+    altura, largura = antes.shape[:2]
+
+    def diferenca_da_faixa(faixa):
+        y0, y1 = faixa
+        binaria_antes = binarizar_imagem(ler_cinza(antes, y0, y1, 0, largura), limiar_antes)
+        binaria_depois = binarizar_imagem(ler_cinza(depois, y0, y1, 0, largura), limiar_depois)
+        return EstatisticasIntensidade().atualizar(cv2.absdiff(binaria_antes, binaria_depois))
+
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        estatisticas = EstatisticasIntensidade()
+        for parcial in executor.map(diferenca_da_faixa, gerar_faixas(altura, linhas_por_faixa)):
+            estatisticas.combinar(parcial)
+    return estatisticas
+
+
+def estatisticas_da_cena(caminho, raster, diretorio_cache=None, trabalhadores=None):
+    if diretorio_cache is None:
+        return estatisticas_em_faixas(raster, trabalhadores=trabalhadores)
+    return estatisticas_de_arquivo(caminho, lambda: estatisticas_em_faixas(raster, trabalhadores=trabalhadores),
+                                   variante="cinza", diretorio_cache=diretorio_cache)
+
+
+def processar_ladrilho(antes, depois, saida, janela, limiares, kernel_size):
+    altura, largura = antes.shape[:2]
+    y0, y1, x0, x1 = janela
+
+    # A abertura (erosão seguida de dilatação) propaga cada pixel por até
+    # 2 * (kernel_size // 2) posições, então essa margem basta para o resultado
+    # no interior do ladrilho ser idêntico ao da cena inteira
+    halo = 2 * (kernel_size // 2)
+    ya, yb = max(0, y0 - halo), min(altura, y1 + halo)
+    xa, xb = max(0, x0 - halo), min(largura, x1 + halo)
+
+    limiar_antes, limiar_depois, limiar_diferenca = limiares
+    binaria_antes = binarizar_imagem(ler_cinza(antes, ya, yb, xa, xb), limiar_antes)
+    binaria_depois = binarizar_imagem(ler_cinza(depois, ya, yb, xa, xb), limiar_depois)
+    diferenca = binarizar_imagem(cv2.absdiff(binaria_antes, binaria_depois), limiar_diferenca)
+    filtrada = aplicar_filtro_morfologico(diferenca, kernel_size)
+
+    recorte = filtrada[y0 - ya:y1 - ya, x0 - xa:x1 - xa]
+    saida[y0:y1, x0:x1] = recorte
+    return int(np.count_nonzero(recorte))
+
+
+def detectar_mudancas_em_ladrilhos(caminho_antes, caminho_depois, caminho_saida, kernel_size=3,
+                                   tamanho_ladrilho=1024, trabalhadores=None, metodo_limiar="media",
+                                   percentil=50, diretorio_cache=None):
+    antes = abrir_raster(caminho_antes)
+    depois = abrir_raster(caminho_depois)
+    if antes.shape[:2] != depois.shape[:2]:
+        raise ValueError(f"As cenas precisam ter o mesmo tamanho: {antes.shape[:2]} e {depois.shape[:2]}")
+    if not caminho_saida.lower().endswith(".npy"):
+        raise ValueError("A saída em ladrilhos deve ser um arquivo .npy")
+
+    altura, largura = antes.shape[:2]
+
+    # Os limiares são globais: calculados numa passada por faixas e depois
+    # aplicados igualmente a todos os ladrilhos
+    estatisticas_antes = estatisticas_da_cena(caminho_antes, antes, diretorio_cache, trabalhadores)
+    estatisticas_depois = estatisticas_da_cena(caminho_depois, depois, diretorio_cache, trabalhadores)
+    limiar_antes = estatisticas_antes.limiar(metodo_limiar, percentil)
+    limiar_depois = estatisticas_depois.limiar(metodo_limiar, percentil)
+    limiar_diferenca = estatisticas_diferenca_em_faixas(antes, depois, limiar_antes, limiar_depois,
+                                                        trabalhadores=trabalhadores).media
+    limiares = (limiar_antes, limiar_depois, limiar_diferenca)
+
+    saida = np.lib.format.open_memmap(caminho_saida, mode="w+", dtype=np.uint8, shape=(altura, largura))
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        contagens = executor.map(
+            lambda janela: processar_ladrilho(antes, depois, saida, janela, limiares, kernel_size),
+            gerar_janelas(altura, largura, tamanho_ladrilho))
+        pixels_alterados = sum(contagens)
+    saida.flush()
+    del saida
+
+    return pixels_alterados, limiares
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecção de mudanças em ladrilhos para cenas grandes.")
+    parser.add_argument("antes", help="cena 'antes' (.npy mapeado em memória ou imagem)")
+    parser.add_argument("depois", help="cena 'depois' (.npy mapeado em memória ou imagem)")
+    parser.add_argument("saida", help="arquivo .npy onde a máscara filtrada é escrita")
+    parser.add_argument("--kernel", type=int, default=3, help="tamanho do kernel da abertura")
+    parser.add_argument("--ladrilho", type=int, default=1024, help="lado do ladrilho em pixels")
+    parser.add_argument("-j", "--trabalhadores", type=int, default=None, help="threads processando ladrilhos")
+    parser.add_argument("--limiar", choices=METODOS_LIMIAR, default="media",
+                        help="como calcular o limiar de binarização de cada cena")
+    parser.add_argument("--percentil", type=float, default=50, help="percentil usado com --limiar percentil")
+    parser.add_argument("--cache", default=None, help="diretório para guardar as estatísticas de cada cena")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        pixels_alterados, limiares = detectar_mudancas_em_ladrilhos(
+            args.antes, args.depois, args.saida, args.kernel, args.ladrilho, args.trabalhadores,
+            args.limiar, args.percentil, args.cache)
+    except Exception as e:
+        print(f"Erro: {e}")
+        return
+
+    print(f"Limiares (antes, depois, diferença): {', '.join(f'{limiar:.2f}' for limiar in limiares)}")
+    print(f"Pixels alterados: {pixels_alterados}")
+    print(f"Máscara salva em: {args.saida} ({time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
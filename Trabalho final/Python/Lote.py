@@ -0,0 +1,184 @@
+import argparse
+import csv
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from DetectarMudancas import detectar_mudancas_arquivos
+from Tabelas import EscritorTabela, caminho_tabela_cenas
+from Cache import TAMANHO_MAXIMO_PADRAO, CacheResultados
+
+PADRAO_NOME = re.compile(r"^(\d{2})(\d{4})\.(png|jpg|jpeg|tif|tiff)$", re.IGNORECASE)
+VARIAVEIS_THREADS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                     "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+CAMPOS_RESUMO = ("nome", "antes", "depois", "tempo_total_s", "tempo_segmentacao_s", "tempo_subtracao_s",
+                 "tempo_abertura_s", "tempo_mascaras_s", "pixels_alterados", "fracao_alterada", "regioes", "erro")
+
+
+def descobrir_series(diretorio):
+    # Arquivos NNAAAA.ext: NN identifica o local e AAAA o ano da aquisição.
+    # Devolve, para cada local, os caminhos em ordem cronológica
+    datas_por_local = {}
+    for nome_arquivo in os.listdir(diretorio):
+        correspondencia = PADRAO_NOME.match(nome_arquivo)
+        if correspondencia:
+            local, ano = correspondencia.group(1), correspondencia.group(2)
+            datas_por_local.setdefault(local, []).append((ano, os.path.join(diretorio, nome_arquivo)))
+    return {local: [caminho for _, caminho in sorted(datas_por_local[local])] for local in sorted(datas_por_local)}
+
+
+def descobrir_pares(diretorio):
+    pares = []
+    for datas in descobrir_series(diretorio).values():
+        pares.extend(zip(datas, datas[1:]))
+    return pares
+
+
+def ler_manifesto(caminho_manifesto):
+    # Uma linha por par: antes,depois (caminhos relativos à pasta do manifesto)
+    pasta = os.path.dirname(os.path.abspath(caminho_manifesto))
+    pares = []
+    with open(caminho_manifesto, newline="", encoding="utf-8") as arquivo:
+        for linha in csv.reader(arquivo):
+            if not linha or linha[0].strip().startswith("#"):
+                continue
+            if len(linha) < 2:
+                raise ValueError(f"Linha inválida no manifesto: {linha}")
+            antes, depois = linha[0].strip(), linha[1].strip()
+            if (antes, depois) == ("antes", "depois"):
+                continue
+            pares.append((os.path.join(pasta, antes), os.path.join(pasta, depois)))
+    return pares
+
+
+def limitar_threads(threads):
+    # Herdado pelos processos filhos antes de carregarem numpy/OpenBLAS
+    for variavel in VARIAVEIS_THREADS:
+        os.environ[variavel] = str(threads)
+
+
+def _inicializar_trabalhador(threads):
+    global _limites
+    cv2.setNumThreads(threads)
+    _limites = threadpool_limits(threads)
+
+
+def processar_par(antes, depois, diretorio_saida, salvar_intermediarios=False, parametros=None):
+    nome = f"{os.path.splitext(os.path.basename(antes))[0]}_{os.path.splitext(os.path.basename(depois))[0]}"
+    linha = {"nome": nome, "antes": antes, "depois": depois, "erro": ""}
+
+    inicio = time.perf_counter()
+    try:
+        resultados = detectar_mudancas_arquivos(antes, depois, diretorio_saida, salvar_intermediarios,
+                                                **(parametros or {}))
+    except Exception as e:
+        linha["erro"] = str(e)
+        linha["tempo_total_s"] = round(time.perf_counter() - inicio, 3)
+        return linha, [], None
+
+    linha["tempo_total_s"] = round(time.perf_counter() - inicio, 3)
+    for etapa, duracao in resultados["tempos"].items():
+        linha[f"tempo_{etapa}_s"] = round(duracao, 3)
+
+    filtrada = resultados["filtrada"]
+    alterados = int(np.count_nonzero(filtrada))
+    linha["pixels_alterados"] = alterados
+    linha["fracao_alterada"] = round(alterados / filtrada.size, 6)
+    linha["regioes"] = resultados["totais"]["regioes"]
+    return linha, resultados["regioes"], resultados["totais"]
+
+
+def processar_lote(pares, diretorio_saida, trabalhadores=None, threads_por_trabalhador=1,
+                   salvar_intermediarios=False, parametros=None, caminho_regioes=None):
+    os.makedirs(diretorio_saida, exist_ok=True)
+    caminho_resumo = os.path.join(diretorio_saida, "resumo.csv")
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+
+    limitar_threads(threads_por_trabalhador)
+
+    # Só o processo principal escreve nas tabelas de regiões, à medida que os pares terminam
+    tabela_regioes = EscritorTabela(caminho_regioes) if caminho_regioes else None
+    tabela_cenas = EscritorTabela(caminho_tabela_cenas(caminho_regioes)) if caminho_regioes else None
+
+    linhas = []
+    inicio = time.perf_counter()
+    try:
+        with open(caminho_resumo, "w", newline="", encoding="utf-8") as arquivo, \
+                ProcessPoolExecutor(max_workers=trabalhadores, initializer=_inicializar_trabalhador,
+                                    initargs=(threads_por_trabalhador,)) as executor:
+            escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_RESUMO)
+            escritor.writeheader()
+
+            futuros = [executor.submit(processar_par, antes, depois, diretorio_saida, salvar_intermediarios,
+                                       parametros)
+                       for antes, depois in pares]
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                linha, regioes, totais = futuro.result()
+                escritor.writerow(linha)
+                arquivo.flush()
+                linhas.append(linha)
+
+                if tabela_regioes is not None and totais is not None:
+                    tabela_regioes.escrever(regioes)
+                    tabela_cenas.escrever([totais])
+
+                situacao = f"erro: {linha['erro']}" if linha["erro"] else f"{linha['tempo_total_s']:.2f} s"
+                print(f"[{concluidos}/{len(pares)}] {linha['nome']}: {situacao}")
+    finally:
+        if tabela_regioes is not None:
+            tabela_regioes.fechar()
+            tabela_cenas.fechar()
+
+    duracao = time.perf_counter() - inicio
+    print(f"{len(pares)} pares em {duracao:.2f} s com {trabalhadores} processos "
+          f"({len(pares) / duracao:.2f} pares/s). Resumo em: {caminho_resumo}")
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecção de mudanças em lote sobre pares de imagens.")
+    parser.add_argument("entrada", help="diretório com imagens NNAAAA.png ou arquivo de manifesto .csv")
+    parser.add_argument("-o", "--saida", default="saida_lote", help="diretório dos resultados e do resumo")
+    parser.add_argument("-j", "--trabalhadores", type=int, default=None, help="número de processos (padrão: CPUs)")
+    parser.add_argument("--threads", type=int, default=1, help="threads de BLAS/OpenCV por processo")
+    parser.add_argument("--intermediarios", action="store_true", help="salva também as imagens de cada etapa")
+    parser.add_argument("--quantil", type=float, default=0.1, help="quantil do Mean Shift (0.01-0.2)")
+    parser.add_argument("--amostras", type=int, default=500, help="amostras para estimar a largura de banda")
+    parser.add_argument("--kernel", type=int, default=3, help="tamanho do kernel da abertura")
+    parser.add_argument("--motor", choices=("original", "vetorizado", "histograma"), default="vetorizado",
+                        help="implementação do Mean Shift")
+    parser.add_argument("--regioes", default=None,
+                        help="tabela .csv ou .parquet com as estatísticas de cada região de todos os pares")
+    parser.add_argument("--cache", default=None,
+                        help="diretório, compartilhado pelos processos, para Mean Shift, largura de banda e limiares")
+    parser.add_argument("--cache-max", type=float, default=TAMANHO_MAXIMO_PADRAO / 2 ** 20,
+                        help="tamanho máximo do cache em MiB")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.entrada):
+        pares = descobrir_pares(args.entrada)
+    elif os.path.isfile(args.entrada):
+        pares = ler_manifesto(args.entrada)
+    else:
+        print(f"Entrada não encontrada: {args.entrada}")
+        return
+
+    if not pares:
+        print("Nenhum par de imagens encontrado.")
+        return
+
+    parametros = {"quantil": args.quantil, "amostras": args.amostras, "kernel_size": args.kernel,
+                  "motor": args.motor}
+    if args.cache:
+        parametros["cache"] = CacheResultados(args.cache, int(args.cache_max * 2 ** 20))
+    processar_lote(pares, args.saida, args.trabalhadores, args.threads, args.intermediarios, parametros,
+                   args.regioes)
+
+
+if __name__ == "__main__":
+    main()
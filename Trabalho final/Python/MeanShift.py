@@ -1,6 +1,7 @@
 from PIL import Image
 import numpy as np
 from sklearn.cluster import MeanShift, estimate_bandwidth
+from sklearn.neighbors import NearestNeighbors
 import os
 
 
@@ -39,25 +40,198 @@ def make_shifted_img(shape, labels, centers):
     return np.array(img, dtype='uint8')
 
 
-def segmentar_imagem_mean_shift(caminho_imagem, caminho_saida, quantil=0.1, amostras=500):
-    try:
-        imagem = Image.open(caminho_imagem).convert('RGB')
-        array_img = np.array(imagem)
-        array_img = redimensionar_imagem(array_img)
+def para_dados_vetorizado(img):
+    # Visão (H*W, 3) do próprio buffer da imagem, sem cópia quando ela já é contígua
+    img = np.ascontiguousarray(img)
+    return img.reshape(-1, img.shape[-1])
+
+
+def montar_imagem_segmentada(formato, rotulos, centros):
+    # Mesmo truncamento do int(c) de make_shifted_img, feito uma vez por centro
+    paleta = np.asarray(centros).astype(np.uint8)
+    return paleta[rotulos].reshape(*formato, paleta.shape[1])
+
+
+def indices_de_cor(bloco, bits):
+    q = (bloco >> (8 - bits)).astype(np.int32)
+    return (q[..., 0] << (2 * bits)) | (q[..., 1] << bits) | q[..., 2]
+
+
+def histograma_de_cores(array_img, bits=6, linhas_por_bloco=256):
+    num_bins = 1 << (3 * bits)
+    contagens = np.zeros(num_bins, dtype=np.int64)
+    somas = np.zeros((num_bins, 3), dtype=np.float64)
+
+    for inicio in range(0, array_img.shape[0], linhas_por_bloco):
+        bloco = array_img[inicio:inicio + linhas_por_bloco]
+        indices = indices_de_cor(bloco, bits).ravel()
+        contagens += np.bincount(indices, minlength=num_bins)
+        for canal in range(3):
+            somas[:, canal] += np.bincount(indices, weights=bloco[..., canal].ravel(), minlength=num_bins)
+
+    ocupados = np.flatnonzero(contagens)
+    pesos = contagens[ocupados]
+    # Cada bin é representado pela cor média dos pixels que caíram nele
+    cores = somas[ocupados] / pesos[:, np.newaxis]
+    return ocupados, cores, pesos
+
 
-        dados = tuple(to_data(array_img))
+def estimar_largura_banda_ponderada(cores, pesos, quantil=0.3, amostras=500, semente=0, max_elementos=4_000_000):
+    # Equivalente a estimate_bandwidth sobre os pixels: média da distância de cada amostra
+    # ao k-ésimo vizinho, com k = quantil * total de pixels, contando cada cor pelo seu peso
+    rng = np.random.RandomState(semente)
+    total = pesos.sum()
+    k = max(int(total * quantil), 1)
+    amostra = cores[rng.choice(len(cores), size=amostras, p=pesos / total)]
+
+    bloco = max(1, max_elementos // len(cores))
+    soma = 0.0
+    for inicio in range(0, amostras, bloco):
+        parte = amostra[inicio:inicio + bloco]
+        distancias = np.zeros((len(parte), len(cores)))
+        for canal in range(3):
+            distancias += (parte[:, canal, np.newaxis] - cores[np.newaxis, :, canal]) ** 2
+        np.sqrt(distancias, out=distancias)
+        ordem = np.argsort(distancias, axis=1)
+        acumulado = np.cumsum(pesos[ordem], axis=1)
+        posicao = np.minimum((acumulado < k).sum(axis=1), len(cores) - 1)
+        soma += np.take_along_axis(distancias, ordem, axis=1)[np.arange(len(parte)), posicao].sum()
+
+    return soma / amostras
+
+
+def mean_shift_ponderado(cores, pesos, bandwidth, max_iter=300):
+    # Mesmo procedimento do MeanShift(bin_seeding=True) do sklearn, com cada cor
+    # contribuindo para a média com o número de pixels que representa
+    vizinhanca = NearestNeighbors(radius=bandwidth).fit(cores)
+    sementes = np.unique(np.round(cores / bandwidth), axis=0) * bandwidth
+    limiar_parada = 1e-3 * bandwidth
+
+    pontos, massas = [], []
+    for semente in sementes:
+        for _ in range(max_iter):
+            vizinhos = vizinhanca.radius_neighbors([semente], return_distance=False)[0]
+            if len(vizinhos) == 0:
+                break
+            nova = np.average(cores[vizinhos], axis=0, weights=pesos[vizinhos])
+            convergiu = np.linalg.norm(nova - semente) <= limiar_parada
+            semente = nova
+            if convergiu:
+                break
+        if len(vizinhos) > 0:
+            pontos.append(semente)
+            massas.append(pesos[vizinhos].sum())
+
+    pontos = np.array(pontos)[np.argsort(massas)[::-1]]
+    unicos = np.ones(len(pontos), dtype=bool)
+    vizinhanca_centros = NearestNeighbors(radius=bandwidth).fit(pontos)
+    for i, centro in enumerate(pontos):
+        if unicos[i]:
+            vizinhos = vizinhanca_centros.radius_neighbors([centro], return_distance=False)[0]
+            unicos[vizinhos] = False
+            unicos[i] = True
+    centros = pontos[unicos]
+
+    rotulos = NearestNeighbors(n_neighbors=1).fit(centros).kneighbors(cores, return_distance=False)[:, 0]
+    return rotulos, centros
+
+
+def segmentar_histograma_mean_shift(array_img, quantil=0.1, amostras=500, bits=6, linhas_por_bloco=256,
+                                    largura_banda=None, histograma=None):
+    # histograma já calculado por histograma_de_cores (com os mesmos bits) dispensa outra passada
+    if histograma is None:
+        histograma = histograma_de_cores(array_img, bits, linhas_por_bloco)
+    ocupados, cores, pesos = histograma
+    print(f"Cores distintas após quantização em {bits} bits por canal: {len(ocupados)}")
+
+    if largura_banda is None:
+        largura_banda = estimar_largura_banda_ponderada(cores, pesos, quantil, amostras)
+        largura_banda = max(largura_banda, 0.1)
 
+    print(f"Quantil usado: {quantil}, Largura de banda estimada: {largura_banda:.2f}")
+
+    rotulos, centros = mean_shift_ponderado(cores, pesos, largura_banda)
+
+    num_clusters = len(np.unique(rotulos))
+    print(f"Número de clusters encontrados: {num_clusters}")
+
+    lado = 1 << bits
+    tabela = np.zeros((lado, lado, lado, 3), dtype=np.uint8)
+    tabela.reshape(-1, 3)[ocupados] = np.asarray(centros).astype(np.uint8)[rotulos]
+    tabela_plana = tabela.reshape(-1, 3)
+
+    img_segmentada = np.empty(array_img.shape[:2] + (3,), dtype=np.uint8)
+    for inicio in range(0, array_img.shape[0], linhas_por_bloco):
+        bloco = array_img[inicio:inicio + linhas_por_bloco]
+        img_segmentada[inicio:inicio + linhas_por_bloco] = tabela_plana[indices_de_cor(bloco, bits)]
+
+    return img_segmentada, num_clusters
+
+
+def _dados_do_motor(array_img, motor):
+    if motor == "original":
+        return tuple(to_data(array_img))
+    if motor == "vetorizado":
+        return para_dados_vetorizado(array_img)
+    raise ValueError(f"Motor de Mean Shift desconhecido: {motor}")
+
+
+def preparar_dados(array_img, motor="vetorizado", bits=6):
+    # Entrada do Mean Shift de cada motor (pixels ou histograma de cores); preparada uma
+    # vez, serve à estimativa da largura de banda e à segmentação
+    if motor == "histograma":
+        return histograma_de_cores(array_img, bits)
+    return _dados_do_motor(array_img, motor)
+
+
+def estimar_largura_banda(array_img, quantil=0.1, amostras=500, motor="vetorizado", bits=6, dados=None):
+    # A mesma estimativa que segmentar_array_mean_shift faz internamente
+    if dados is None:
+        dados = preparar_dados(array_img, motor, bits)
+    if motor == "histograma":
+        _, cores, pesos = dados
+        return max(estimar_largura_banda_ponderada(cores, pesos, quantil, amostras), 0.1)
+    return max(estimate_bandwidth(dados, quantile=quantil, n_samples=amostras), 0.1)
+
+
+def segmentar_array_mean_shift(array_img, quantil=0.1, amostras=500, motor="vetorizado", largura_banda=None,
+                               dados=None):
+    # largura_banda já estimada (por exemplo, vinda do cache) dispensa a estimativa, e
+    # dados de preparar_dados dispensam uma nova passada sobre a imagem
+    if motor == "histograma":
+        return segmentar_histograma_mean_shift(array_img, quantil, amostras, largura_banda=largura_banda,
+                                               histograma=dados)
+
+    if dados is None:
+        dados = _dados_do_motor(array_img, motor)
+
+    if largura_banda is None:
         largura_banda = estimate_bandwidth(dados, quantile=quantil, n_samples=amostras)
         largura_banda = max(largura_banda, 0.1)
 
-        print(f"Quantil usado: {quantil}, Largura de banda estimada: {largura_banda:.2f}")
+    print(f"Quantil usado: {quantil}, Largura de banda estimada: {largura_banda:.2f}")
 
-        rotulos, centros = mean_shift(dados, largura_banda)
+    rotulos, centros = mean_shift(dados, largura_banda)
 
-        num_clusters = len(np.unique(rotulos))
-        print(f"Número de clusters encontrados: {num_clusters}")
+    num_clusters = len(np.unique(rotulos))
+    print(f"Número de clusters encontrados: {num_clusters}")
 
+    if motor == "original":
         img_segmentada = make_shifted_img(array_img.shape[:2], rotulos, centros)
+    else:
+        img_segmentada = montar_imagem_segmentada(array_img.shape[:2], rotulos, centros)
+
+    return img_segmentada, num_clusters
+
+
+def segmentar_imagem_mean_shift(caminho_imagem, caminho_saida, quantil=0.1, amostras=500, motor="vetorizado"):
+    try:
+        imagem = Image.open(caminho_imagem).convert('RGB')
+        array_img = np.array(imagem)
+        if motor != "histograma":
+            array_img = redimensionar_imagem(array_img)
+
+        img_segmentada, num_clusters = segmentar_array_mean_shift(array_img, quantil, amostras, motor)
 
         Image.fromarray(img_segmentada).save(caminho_saida)
         print(f"Imagem segmentada salva em: {caminho_saida}")
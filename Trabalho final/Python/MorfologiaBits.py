@@ -0,0 +1,199 @@
+import numpy as np
+
+# Máscaras binárias guardadas com 1 bit por pixel: o último eixo é empacotado
+# em palavras de 64 bits (pixel j -> bit j % 64 da palavra j // 64), e as
+# operações morfológicas viram deslocamentos e AND/OR de palavras inteiras.
+# Os deslocamentos do elemento estruturante seguem a convenção do OpenCV
+# (elemento ancorado no centro, tamanho // 2), que coincide com a do scipy
+# para elementos simétricos.
+
+BITS = 64
+CHEIA = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Bits 1 de cada valor de octeto; np.bitwise_count só existe a partir do NumPy 2
+BITS_POR_OCTETO = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint8)
+
+
+def empacotar(mascara):
+    # O packbits já trata qualquer valor não nulo como 1, então máscaras uint8 0/255
+    # são empacotadas sem passar por uma cópia booleana do quadro inteiro
+    mascara = np.asarray(mascara)
+    if mascara.dtype != bool and not np.issubdtype(mascara.dtype, np.integer):
+        mascara = mascara != 0
+    largura = mascara.shape[-1]
+    octetos = np.packbits(mascara, axis=-1, bitorder="little")
+
+    num_palavras = -(-largura // BITS)
+    alinhados = np.zeros(mascara.shape[:-1] + (num_palavras * 8,), dtype=np.uint8)
+    alinhados[..., :octetos.shape[-1]] = octetos
+    return alinhados.view("<u8"), largura
+
+
+def desempacotar(palavras, largura, valor=None):
+    # Sem valor devolve bool; com valor (por exemplo 255), uint8 0/valor. Nos dois
+    # casos o único buffer do tamanho do quadro é o do unpackbits
+    octetos = np.ascontiguousarray(palavras).view(np.uint8)
+    bits = np.unpackbits(octetos, axis=-1, count=largura, bitorder="little")
+    if valor is None:
+        return bits.view(bool)
+    bits *= np.uint8(valor)
+    return bits
+
+
+def contar_bits(palavras):
+    # Número de bits 1 nas palavras, octeto a octeto pela tabela
+    octetos = np.ascontiguousarray(palavras).view(np.uint8)
+    return int(BITS_POR_OCTETO[octetos].sum(dtype=np.int64))
+
+
+def _mascara_validos(num_palavras, largura):
+    validos = np.full(num_palavras, CHEIA, dtype="<u8")
+    resto = largura % BITS
+    if resto:
+        validos[-1] = np.uint64((1 << resto) - 1)
+    return validos
+
+
+def _ajustar_sobra(palavras, largura, valor):
+    # Os bits além da largura entram na janela ao deslocar em x, então precisam
+    # valer o mesmo que a borda
+    validos = _mascara_validos(palavras.shape[-1], largura)
+    if valor:
+        return palavras | ~validos
+    return palavras & validos
+
+
+def _deslocar_x(palavras, deslocamento, largura, borda):
+    # resultado[j] = entrada[j + deslocamento]; fora da imagem vale a borda
+    if deslocamento == 0:
+        return palavras
+    palavras = _ajustar_sobra(palavras, largura, borda)
+    preenchimento = CHEIA if borda else np.uint64(0)
+    num_palavras = palavras.shape[-1]
+    inteiras, bits = divmod(abs(deslocamento), BITS)
+
+    fora = np.full(palavras.shape[:-1] + (min(inteiras + 1, num_palavras + 1),), preenchimento, dtype="<u8")
+    if deslocamento > 0:
+        estendido = np.concatenate([palavras, fora], axis=-1)
+        base = estendido[..., inteiras:inteiras + num_palavras]
+        if bits == 0:
+            return base
+        seguinte = estendido[..., inteiras + 1:inteiras + 1 + num_palavras]
+        return (base >> np.uint64(bits)) | (seguinte << np.uint64(BITS - bits))
+
+    estendido = np.concatenate([fora, palavras], axis=-1)
+    inicio = fora.shape[-1]
+    base = estendido[..., inicio - inteiras:inicio - inteiras + num_palavras]
+    if bits == 0:
+        return base
+    anterior = estendido[..., inicio - inteiras - 1:inicio - inteiras - 1 + num_palavras]
+    return (base << np.uint64(bits)) | (anterior >> np.uint64(BITS - bits))
+
+
+def _deslocar_eixo(palavras, eixo, deslocamento, borda):
+    # resultado[i] = entrada[i + deslocamento] ao longo de um eixo que não é o empacotado
+    if deslocamento == 0:
+        return palavras
+    tamanho = palavras.shape[eixo]
+    resultado = np.full_like(palavras, CHEIA if borda else 0)
+    if abs(deslocamento) >= tamanho:
+        return resultado
+
+    destino = [slice(None)] * palavras.ndim
+    origem = [slice(None)] * palavras.ndim
+    if deslocamento > 0:
+        destino[eixo] = slice(0, tamanho - deslocamento)
+        origem[eixo] = slice(deslocamento, tamanho)
+    else:
+        destino[eixo] = slice(-deslocamento, tamanho)
+        origem[eixo] = slice(0, tamanho + deslocamento)
+    resultado[tuple(destino)] = palavras[tuple(origem)]
+    return resultado
+
+
+def _deslocar(palavras, eixo, deslocamento, largura, borda):
+    if eixo == palavras.ndim - 1:
+        return _deslocar_x(palavras, deslocamento, largura, borda)
+    return _deslocar_eixo(palavras, eixo, deslocamento, borda)
+
+
+def _acumular(palavras, eixo, alcance, sentido, operacao, largura, borda):
+    # operacao sobre entrada[j + sentido * t] para t = 0..alcance, dobrando a
+    # janela a cada passo: log2(alcance) deslocamentos em vez de alcance
+    acumulado = palavras
+    cobertos = 1
+    while cobertos < alcance + 1:
+        passo = min(cobertos, alcance + 1 - cobertos)
+        acumulado = operacao(acumulado, _deslocar(acumulado, eixo, sentido * passo, largura, borda))
+        cobertos += passo
+    return acumulado
+
+
+def _linha(palavras, eixo, tamanho, operacao, largura, borda):
+    # Janela [-tamanho // 2, tamanho - 1 - tamanho // 2] ao longo do eixo, calculada
+    # como a combinação de uma metade para a esquerda e outra para a direita; cada
+    # metade só puxa valores de um lado, então a borda entra corretamente
+    antes = tamanho // 2
+    depois = tamanho - 1 - antes
+    resultado = _acumular(palavras, eixo, depois, 1, operacao, largura, borda)
+    if antes:
+        resultado = operacao(resultado, _acumular(palavras, eixo, antes, -1, operacao, largura, borda))
+    return resultado
+
+
+def _aplicar(palavras, largura, estrutura, operacao, borda):
+    estrutura = np.asarray(estrutura, dtype=bool)
+    if estrutura.ndim != palavras.ndim:
+        raise ValueError(f"O elemento estruturante deve ter {palavras.ndim} dimensões")
+
+    if estrutura.all():
+        # Caixa: decomposta em passadas 1D separáveis, uma por eixo
+        for eixo, tamanho in enumerate(estrutura.shape):
+            if tamanho > 1:
+                palavras = _linha(palavras, eixo, tamanho, operacao, largura, borda)
+        return _ajustar_sobra(palavras, largura, False)
+
+    centro = np.array(estrutura.shape) // 2
+    resultado = None
+    for posicao in np.argwhere(estrutura):
+        deslocado = palavras
+        for eixo, deslocamento in enumerate(posicao - centro):
+            deslocado = _deslocar(deslocado, eixo, int(deslocamento), largura, borda)
+        resultado = deslocado if resultado is None else operacao(resultado, deslocado)
+    return _ajustar_sobra(resultado, largura, False)
+
+
+def erodir_empacotado(palavras, largura, estrutura, iteracoes=1, borda=True):
+    for _ in range(iteracoes):
+        palavras = _aplicar(palavras, largura, estrutura, np.bitwise_and, borda)
+    return palavras
+
+
+def dilatar_empacotado(palavras, largura, estrutura, iteracoes=1):
+    for _ in range(iteracoes):
+        palavras = _aplicar(palavras, largura, estrutura, np.bitwise_or, False)
+    return palavras
+
+
+def erodir(mascara, estrutura, iteracoes=1, borda=True):
+    # borda=True trata o exterior como 1 (OpenCV); borda=False como 0 (scipy)
+    palavras, largura = empacotar(mascara)
+    return desempacotar(erodir_empacotado(palavras, largura, estrutura, iteracoes, borda), largura)
+
+
+def dilatar(mascara, estrutura, iteracoes=1):
+    palavras, largura = empacotar(mascara)
+    return desempacotar(dilatar_empacotado(palavras, largura, estrutura, iteracoes), largura)
+
+
+def abrir(mascara, estrutura, iteracoes=1, borda=True):
+    palavras, largura = empacotar(mascara)
+    palavras = erodir_empacotado(palavras, largura, estrutura, iteracoes, borda)
+    palavras = dilatar_empacotado(palavras, largura, estrutura, iteracoes)
+    return desempacotar(palavras, largura)
+
+
+def gradiente(mascara, estrutura, borda=True):
+    palavras, largura = empacotar(mascara)
+    dilatada = dilatar_empacotado(palavras, largura, estrutura)
+    erodida = erodir_empacotado(palavras, largura, estrutura, 1, borda)
+    return desempacotar(dilatada & ~erodida, largura)
@@ -0,0 +1,238 @@
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from Abertura import aplicar_filtro_morfologico
+from Cache import TAMANHO_MAXIMO_PADRAO, CacheResultados
+from DetectarMudancas import segmentar_e_binarizar
+from Lote import descobrir_series
+from MorfologiaBits import BITS, contar_bits, desempacotar, dilatar_empacotado, empacotar, erodir_empacotado
+from Subtrair import carregar_imagem, redimensionar_para_compatibilidade
+from Tabelas import EscritorTabela
+
+SEM_MUDANCA = -1
+
+
+class PilhaBinaria:
+    # T máscaras co-registradas numa só matriz: (T, H, W) em uint8 0/1 ou, empacotada,
+    # (T, H, ceil(W / 64)) palavras de 64 bits. Com caminho, a matriz é um .npy
+    # mapeado em memória e séries longas não precisam caber na RAM.
+
+    def __init__(self, num_datas, altura, largura, empacotada=False, caminho=None):
+        self.altura = altura
+        self.largura = largura
+        self.empacotada = empacotada
+        if empacotada:
+            formato, tipo = (num_datas, altura, -(-largura // BITS)), np.dtype("<u8")
+        else:
+            formato, tipo = (num_datas, altura, largura), np.dtype(np.uint8)
+
+        if caminho:
+            self.dados = np.lib.format.open_memmap(caminho, mode="w+", dtype=tipo, shape=formato)
+        else:
+            self.dados = np.zeros(formato, dtype=tipo)
+
+    def __len__(self):
+        return self.dados.shape[0]
+
+    def definir(self, indice, mascara):
+        mascara = np.asarray(mascara) != 0
+        self.dados[indice] = empacotar(mascara)[0] if self.empacotada else mascara
+
+    def mascara(self, indice):
+        return self.expandir(self.dados[indice])
+
+    def expandir(self, quadro):
+        if self.empacotada:
+            return desempacotar(quadro, self.largura)
+        return quadro.view(bool)
+
+    def contar(self, quadro):
+        if self.empacotada:
+            return contar_bits(quadro)
+        return int(np.count_nonzero(quadro))
+
+    def abrir(self, quadro, kernel_size):
+        # Mesma abertura do pipeline de pares, aplicada direto na representação da pilha
+        if kernel_size <= 1:
+            return quadro
+        if self.empacotada:
+            estrutura = np.ones((kernel_size, kernel_size), dtype=bool)
+            erodida = erodir_empacotado(quadro, self.largura, estrutura)
+            return dilatar_empacotado(erodida, self.largura, estrutura)
+        return aplicar_filtro_morfologico(np.ascontiguousarray(quadro), kernel_size)
+
+    def flush(self):
+        if isinstance(self.dados, np.memmap):
+            self.dados.flush()
+
+
+def carregar_binaria(caminho, altura, largura):
+    binaria = cv2.imread(caminho, cv2.IMREAD_GRAYSCALE)
+    if binaria is None:
+        raise ValueError(f"Não foi possível carregar a imagem: {caminho}")
+    if binaria.shape != (altura, largura):
+        binaria = cv2.resize(binaria, (largura, altura), interpolation=cv2.INTER_NEAREST)
+    return binaria
+
+
+def carregar_serie(caminhos, quantil=0.1, amostras=500, motor="vetorizado", cache=None, empacotada=False,
+                   caminho_pilha=None, binarias=False):
+    # Cada data é decodificada, segmentada e binarizada uma única vez. A primeira
+    # define a grade; as seguintes são redimensionadas para ela, como no par antes/depois
+    referencia = carregar_imagem(caminhos[0])
+    altura, largura = referencia.shape[:2]
+    pilha = PilhaBinaria(len(caminhos), altura, largura, empacotada, caminho_pilha)
+
+    for indice, caminho in enumerate(caminhos):
+        if binarias:
+            binaria = carregar_binaria(caminho, altura, largura)
+        else:
+            imagem = referencia if indice == 0 else redimensionar_para_compatibilidade(referencia,
+                                                                                        carregar_imagem(caminho))
+            _, binaria = segmentar_e_binarizar(imagem, quantil, amostras, motor, cache)
+        pilha.definir(indice, binaria)
+    pilha.flush()
+    return pilha
+
+
+def analisar_pilha(pilha, kernel_size=3, diretorio_saida=None):
+    # Uma passada por data: diferença com a data anterior e com a primeira (XOR das
+    # máscaras seguido da abertura), data da primeira mudança e número de mudanças
+    # por pixel. Custo O(T), contra O(T²) de rodar todos os pares.
+    num_datas = len(pilha)
+    primeira_mudanca = np.full((pilha.altura, pilha.largura), SEM_MUDANCA, dtype=np.int16)
+    frequencia = np.zeros((pilha.altura, pilha.largura), dtype=np.uint16)
+
+    consecutivas = linha_de_base = None
+    if diretorio_saida is not None and num_datas > 1:
+        os.makedirs(diretorio_saida, exist_ok=True)
+        consecutivas = PilhaBinaria(num_datas - 1, pilha.altura, pilha.largura, pilha.empacotada,
+                                    os.path.join(diretorio_saida, "consecutivas.npy"))
+        linha_de_base = PilhaBinaria(num_datas - 1, pilha.altura, pilha.largura, pilha.empacotada,
+                                     os.path.join(diretorio_saida, "linha_de_base.npy"))
+
+    alterados_consecutiva = [0]
+    alterados_linha_base = [0]
+    base = pilha.dados[0]
+    anterior = base
+    for indice in range(1, num_datas):
+        atual = pilha.dados[indice]
+        mudou = pilha.abrir(np.bitwise_xor(anterior, atual), kernel_size)
+        desde_base = pilha.abrir(np.bitwise_xor(base, atual), kernel_size)
+        anterior = atual
+
+        mascara = pilha.expandir(mudou)
+        primeira_mudanca[mascara & (primeira_mudanca == SEM_MUDANCA)] = indice
+        frequencia += mascara
+
+        alterados_consecutiva.append(pilha.contar(mudou))
+        alterados_linha_base.append(pilha.contar(desde_base))
+        if consecutivas is not None:
+            consecutivas.dados[indice - 1] = mudou
+            linha_de_base.dados[indice - 1] = desde_base
+
+    if consecutivas is not None:
+        consecutivas.flush()
+        linha_de_base.flush()
+
+    return {
+        "primeira_mudanca": primeira_mudanca,
+        "frequencia": frequencia,
+        "alterados_consecutiva": alterados_consecutiva,
+        "alterados_linha_base": alterados_linha_base,
+        "consecutivas": consecutivas,
+        "linha_de_base": linha_de_base,
+    }
+
+
+def processar_serie(caminhos, diretorio_saida, local="serie", kernel_size=3, quantil=0.1, amostras=500,
+                    motor="vetorizado", cache=None, empacotada=False, mapear=False, binarias=False):
+    os.makedirs(diretorio_saida, exist_ok=True)
+    caminho_pilha = os.path.join(diretorio_saida, "pilha.npy") if mapear else None
+
+    inicio = time.perf_counter()
+    pilha = carregar_serie(caminhos, quantil, amostras, motor, cache, empacotada, caminho_pilha, binarias)
+    tempo_carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultados = analisar_pilha(pilha, kernel_size, diretorio_saida if mapear else None)
+    tempo_analise = time.perf_counter() - inicio
+
+    np.save(os.path.join(diretorio_saida, "primeira_mudanca.npy"), resultados["primeira_mudanca"])
+    np.save(os.path.join(diretorio_saida, "frequencia.npy"), resultados["frequencia"])
+
+    total = pilha.altura * pilha.largura
+    linhas = []
+    for indice, caminho in enumerate(caminhos):
+        linhas.append({
+            "local": local,
+            "data": os.path.splitext(os.path.basename(caminho))[0],
+            "indice": indice,
+            "pixels_alterados_consecutiva": resultados["alterados_consecutiva"][indice],
+            "pixels_alterados_linha_base": resultados["alterados_linha_base"][indice],
+            "fracao_alterada_linha_base": round(resultados["alterados_linha_base"][indice] / total, 6),
+        })
+
+    print(f"{local}: {len(caminhos)} datas, carga {tempo_carga:.2f} s, análise {tempo_analise:.2f} s, "
+          f"{int(np.count_nonzero(resultados['frequencia']))} pixels mudaram ao menos uma vez")
+    return linhas, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecção de mudanças numa série de datas por local.")
+    parser.add_argument("entradas", nargs="+",
+                        help="diretório com imagens NNAAAA.png (uma série por local) ou as datas de uma série, "
+                             "em ordem cronológica")
+    parser.add_argument("-o", "--saida", default="saida_serie", help="diretório dos resultados")
+    parser.add_argument("--kernel", type=int, default=3, help="tamanho do kernel da abertura")
+    parser.add_argument("--quantil", type=float, default=0.1, help="quantil do Mean Shift (0.01-0.2)")
+    parser.add_argument("--amostras", type=int, default=500, help="amostras para estimar a largura de banda")
+    parser.add_argument("--motor", choices=("original", "vetorizado", "histograma"), default="vetorizado",
+                        help="implementação do Mean Shift")
+    parser.add_argument("--binarias", action="store_true",
+                        help="as entradas já são máscaras binárias; pula a segmentação")
+    parser.add_argument("--empacotar", action="store_true", help="guarda as máscaras com 1 bit por pixel")
+    parser.add_argument("--memmap", action="store_true",
+                        help="mantém a pilha e as diferenças em arquivos .npy mapeados em memória")
+    parser.add_argument("--cache", default=None, help="diretório do cache de Mean Shift, largura de banda e limiares")
+    parser.add_argument("--cache-max", type=float, default=TAMANHO_MAXIMO_PADRAO / 2 ** 20,
+                        help="tamanho máximo do cache em MiB")
+    parser.add_argument("--tabela", default=None,
+                        help="tabela .csv ou .parquet com as contagens por data (padrão: <saida>/serie.csv)")
+    args = parser.parse_args()
+
+    if len(args.entradas) == 1 and os.path.isdir(args.entradas[0]):
+        series = {local: caminhos for local, caminhos in descobrir_series(args.entradas[0]).items()
+                  if len(caminhos) > 1}
+    else:
+        series = {"serie": args.entradas}
+
+    if not series:
+        print("Nenhuma série com duas ou mais datas encontrada.")
+        return
+
+    cache = CacheResultados(args.cache, int(args.cache_max * 2 ** 20)) if args.cache else None
+    caminho_tabela = args.tabela or os.path.join(args.saida, "serie.csv")
+    os.makedirs(args.saida, exist_ok=True)
+
+    # A tabela descreve só a execução atual, como o resumo.csv do Lote: rodar de novo a substitui
+    with EscritorTabela(caminho_tabela, anexar=False) as tabela:
+        for local, caminhos in series.items():
+            diretorio = args.saida if len(series) == 1 else os.path.join(args.saida, local)
+            try:
+                linhas, _ = processar_serie(caminhos, diretorio, local, args.kernel, args.quantil, args.amostras,
+                                            args.motor, cache, args.empacotar, args.memmap, args.binarias)
+            except Exception as e:
+                print(f"{local}: erro: {e}")
+                continue
+            tabela.escrever(linhas)
+
+    print(f"Resultados salvos em: {os.path.abspath(args.saida)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import csv
+import os
+import tempfile
+
+
+class EscritorTabela:
+    def __init__(self, caminho, campos=None, anexar=True):
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao not in (".csv", ".parquet"):
+            raise ValueError("A tabela deve ter extensão .csv ou .parquet")
+
+        self.caminho = caminho
+        self.campos = list(campos) if campos else None
+        self.formato = extensao[1:]
+        # anexar=True acrescenta ao arquivo existente (CSV e Parquet); False o substitui
+        self.anexar = anexar
+        self._arquivo = None
+        self._escritor = None
+        self._temporario = None
+
+    def escrever(self, linhas):
+        if not linhas:
+            return
+        if self.campos is None:
+            self.campos = list(linhas[0].keys())
+
+        if self.formato == "csv":
+            self._escrever_csv(linhas)
+        else:
+            self._escrever_parquet(linhas)
+
+    def _escrever_csv(self, linhas):
+        if self._escritor is None:
+            # Acrescenta ao arquivo existente; o cabeçalho só é escrito se ele estiver vazio
+            novo = not self.anexar or not os.path.isfile(self.caminho) or os.path.getsize(self.caminho) == 0
+            self._arquivo = open(self.caminho, "a" if self.anexar else "w", newline="", encoding="utf-8")
+            self._escritor = csv.DictWriter(self._arquivo, fieldnames=self.campos, extrasaction="ignore")
+            if novo:
+                self._escritor.writeheader()
+        self._escritor.writerows(linhas)
+        self._arquivo.flush()
+
+    def _escrever_parquet(self, linhas):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("A saída em Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+        colunas = {campo: [linha.get(campo) for linha in linhas] for campo in self.campos}
+        if self._escritor is None and self.anexar and os.path.isfile(self.caminho):
+            # O Parquet não aceita acréscimo no lugar: as linhas antigas são copiadas, um
+            # row group por vez, para um temporário que substitui o arquivo ao fechar
+            existente = pq.ParquetFile(self.caminho)
+            descritor, self._temporario = tempfile.mkstemp(dir=os.path.dirname(self.caminho) or ".",
+                                                           suffix=".parquet.tmp")
+            os.close(descritor)
+            self._escritor = pq.ParquetWriter(self._temporario, existente.schema_arrow)
+            for indice in range(existente.num_row_groups):
+                self._escritor.write_table(existente.read_row_group(indice))
+            existente.close()
+            tabela = pa.table(colunas, schema=self._escritor.schema)
+        elif self._escritor is None:
+            tabela = pa.table(colunas)
+            self._escritor = pq.ParquetWriter(self.caminho, tabela.schema)
+        else:
+            tabela = pa.table(colunas, schema=self._escritor.schema)
+        # Cada chamada vira um row group, então o arquivo cresce sem reter as linhas em memória
+        self._escritor.write_table(tabela)
+
+    def fechar(self):
+        if self.formato == "csv" and self._arquivo is not None:
+            self._arquivo.close()
+        elif self.formato == "parquet" and self._escritor is not None:
+            self._escritor.close()
+            if self._temporario is not None:
+                os.replace(self._temporario, self.caminho)
+        self._arquivo = None
+        self._temporario = None
+        self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def caminho_tabela_cenas(caminho_regioes):
+    base, extensao = os.path.splitext(caminho_regioes)
+    return f"{base}_cenas{extensao}"